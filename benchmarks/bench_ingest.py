@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory benchmark for streaming mail ingestion.
+
+Writes a synthetic mbox built from mail_data.csv, with a mix of plain text,
+quoted-printable, base64 and multipart/alternative HTML messages, then
+streams it through mail_ingest.iter_mail. Reports messages per second and the
+peak resident memory, which stays flat as the mailbox grows because only the
+message being parsed is held in memory.
+
+Usage (from the project root):
+    python benchmarks/bench_ingest.py
+    python benchmarks/bench_ingest.py --repeat 50 --keep /tmp/bench.mbox
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_ingest import iter_mail
+from spam_detector import read_data_file
+from train_stream import peak_rss_mb
+
+def build_message(number, text):
+    """Build one message, cycling through the transfer encodings and structures seen in real mail."""
+    message = EmailMessage()
+    message['From'] = 'sender@example.com'
+    message['To'] = 'user@example.com'
+    message['Subject'] = f'Message {number}'
+    kind = number % 4
+    if kind == 0:
+        message.set_content(text)
+    elif kind == 1:
+        message.set_content(text, cte='quoted-printable')
+    elif kind == 2:
+        message.set_content(text, cte='base64')
+    else:
+        message.set_content(text)
+        message.add_alternative(f'<html><body><p>{text}</p></body></html>', subtype='html', cte='base64')
+    return message.as_bytes()
+
+def write_mbox(path, messages, repeat):
+    with open(path, 'wb') as f:
+        for _ in range(repeat):
+            for data in messages:
+                f.write(b'From sender@example.com Thu Jan  1 00:00:00 2026\n')
+                # mboxrd escaping of body lines that look like separators
+                for line in data.splitlines(keepends=True):
+                    f.write(b'>' + line if line.lstrip(b'>').startswith(b'From ') else line)
+                f.write(b'\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark streaming mbox ingestion.')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to build messages from (default: mail_data.csv)')
+    parser.add_argument('--repeat', type=int, default=10, help='Times the dataset is written into the mbox (default: 10)')
+    parser.add_argument('--keep', metavar='PATH', help='Write the mbox here and keep it instead of using a temporary file')
+    args = parser.parse_args()
+
+    df = read_data_file(args.data)
+    messages = [build_message(number, text) for number, text in enumerate(df['Message'])]
+    path = args.keep or os.path.join(tempfile.mkdtemp(), 'bench.mbox')
+    write_mbox(path, messages, args.repeat)
+    size_mb = os.path.getsize(path) / 1024 ** 2
+    try:
+        start = time.perf_counter()
+        count = characters = 0
+        for text in iter_mail(path):
+            count += 1
+            characters += len(text)
+        elapsed = time.perf_counter() - start
+    finally:
+        if not args.keep:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+    expected = len(messages) * args.repeat
+    print(f"Parsed {count} of {expected} messages ({size_mb:.1f} MB mbox) in {elapsed:.2f}s - "
+          f"{count / elapsed:,.0f} messages/sec, {size_mb / elapsed:.1f} MB/s")
+    print(f"Decoded text: {characters / max(count, 1):,.0f} characters per message")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Peak RSS: {peak:.1f} MB")
+
+if __name__ == "__main__":
+    main()
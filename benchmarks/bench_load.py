@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Load generator for the scoring path.
+
+Replays messages from mail_data.csv (or a synthetic expansion of it) at a
+target rate with a fixed number of concurrent clients, against one of:
+  - the micro-batcher of scoring_server.py, in this process (default)
+  - scoring_server.py started in a subprocess on a free local port (--spawn)
+  - a scoring server that is already running (--url, with --pid to measure it)
+
+Requests are sent on an open-loop schedule: request i is due at i / qps
+seconds, and its latency is measured from that time, so time spent waiting
+for a free client when the scorer falls behind counts against it. With
+--qps 0 every client sends as fast as it gets answers.
+
+Reports p50/p95/p99 latency with a histogram, achieved throughput, the error
+rate, and the CPU time and memory of the scorer (read from /proc on Linux).
+In process, the CPU time is that of the micro-batcher thread, but the memory
+is that of the whole load-generator process, since threads share it; for a
+server it is the server process. Results are
+saved as JSON with the model version being served, and can be compared with
+an earlier run, for example of another model version.
+
+Usage (from the project root):
+    python benchmarks/bench_load.py --qps 500 --concurrency 16 --duration 30
+    python benchmarks/bench_load.py --spawn --qps 0 --concurrency 64 --scale 10
+    python benchmarks/bench_load.py --url http://localhost:8080 --pid 12345 --baseline load_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+import urllib.parse
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from bench_preprocess import load_corpus, synthetic_corpus
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+def cpu_seconds(pid=None, tid=None):
+    """
+    User plus system CPU seconds of a process, or of one of its threads, from
+    /proc. Falls back to this process's own usage where /proc is unavailable.
+    Returns None if it cannot be measured.
+    """
+    path = f'/proc/{pid or os.getpid()}' + (f'/task/{tid}' if tid else '') + '/stat'
+    try:
+        with open(path) as f:
+            # Fields after the command name, which is in parentheses and may contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        if pid is None and tid is None:
+            try:
+                import resource
+            except ImportError:  # Windows
+                return None
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            return usage.ru_utime + usage.ru_stime
+        return None
+
+def memory_mb(pid=None):
+    """Current and peak resident memory of a process in MB, or (None, None) if unavailable."""
+    values = {}
+    try:
+        with open(f'/proc/{pid or os.getpid()}/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, value = line.split(':')
+                    values[name] = int(value.split()[0]) / 1024
+    except OSError:
+        if pid is None:
+            try:
+                import resource
+            except ImportError:  # Windows
+                return None, None
+            # ru_maxrss is in KB on Linux and bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return None, peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return values.get('VmRSS'), values.get('VmHWM')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class InProcessTarget:
+    """Scores through a MicroBatcher in this process, as the scoring server does."""
+
+    def __init__(self, cache_size, cascade):
+        from scoring_server import MicroBatcher
+        from prediction_cache import PredictionCache
+        from test_model import load_model_version
+
+        version = load_model_version()
+        if version is None:
+            raise RuntimeError("Model files not found. Please run spam_detector.py first to train the model.")
+        cache = PredictionCache(cache_size) if cache_size > 0 else None
+        self.batcher = MicroBatcher(version.cv, version.svm, normalizer=version.normalizer, cache=cache,
+                                    cascade=version.cascade if cascade else None)
+        self.pid = None
+        self.tid = self.batcher.worker.native_id
+
+    def client(self):
+        return lambda message: self.batcher.score([message])[0]
+
+    def close(self):
+        pass
+
+class HTTPTarget:
+    """Scores through POST /score of a scoring server, one keep-alive connection per client."""
+
+    def __init__(self, url, pid=None, process=None):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.pid = pid
+        self.tid = None
+        self.process = process
+
+    def client(self):
+        state = {'connection': None}
+
+        def score(message):
+            if state['connection'] is None:
+                state['connection'] = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                state['connection'].request('POST', '/score', json.dumps({'message': message}),
+                                            {'Content-Type': 'application/json'})
+                response = state['connection'].getresponse()
+                body = response.read()
+            except Exception:
+                # Reconnect on the next request
+                state['connection'].close()
+                state['connection'] = None
+                raise
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            return json.loads(body)['prediction']
+        return score
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+def spawn_server(cache_size, cascade, timeout=120):
+    """Start scoring_server.py on a free port and return an HTTPTarget once it answers /health."""
+    port = free_port()
+    command = [sys.executable, 'scoring_server.py', '--port', str(port), '--cache-size', str(cache_size)]
+    if not cascade:
+        command.append('--no-cascade')
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"scoring_server.py exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                connection.close()
+                return HTTPTarget(f'http://127.0.0.1:{port}', process.pid, process)
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"scoring_server.py did not answer within {timeout}s")
+
+def run_load(target, messages, total, qps, concurrency):
+    """
+    Send total requests from concurrency client threads, request i due at
+    i / qps seconds (or as soon as a client is free with qps 0). Returns
+    (latencies, service_times, errors, elapsed) with times in seconds.
+    """
+    lock = threading.Lock()
+    counter = {'next': 0}
+    latencies = []
+    service_times = []
+    errors = []
+    start = time.perf_counter() + 0.1
+
+    def worker():
+        score = target.client()
+        while True:
+            with lock:
+                i = counter['next']
+                counter['next'] += 1
+            if i >= total:
+                return
+            due = start + i / qps if qps > 0 else time.perf_counter()
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                score(messages[i % len(messages)])
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            done = time.perf_counter()
+            with lock:
+                latencies.append(done - due)
+                service_times.append(done - sent)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, service_times, errors, time.perf_counter() - start
+
+def summarize(seconds):
+    """p50/p95/p99/max and the histogram of a list of seconds, in milliseconds."""
+    if not seconds:
+        return None
+    values = np.array(seconds) * 1000
+    counts = np.histogram(values, bins=(0, *HISTOGRAM_BUCKETS_MS))[0]
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+        'mean_ms': float(values.mean()),
+        'histogram': {f'<={bound:g}ms' if bound != float('inf') else 'slower': int(count)
+                      for bound, count in zip(HISTOGRAM_BUCKETS_MS, counts)},
+    }
+
+def model_version():
+    """Name and metrics of the published model version, if any."""
+    try:
+        from model_store import current_version_name, read_manifest
+        name = current_version_name()
+        if name is not None:
+            return {'version': name, 'metrics': read_manifest(name).get('metrics', {})}
+    except Exception:
+        pass
+    return {'version': None, 'metrics': {}}
+
+def print_results(results):
+    run = results['results']
+    print(f"\n{run['requests']} requests in {run['elapsed_seconds']:.2f}s - {run['throughput']:,.0f} requests/sec "
+          f"(target {results['meta']['qps'] or 'unlimited'} qps, {results['meta']['concurrency']} clients)")
+    print(f"Errors: {run['errors']} ({run['error_rate']:.2%})" +
+          (f", first: {run['first_error']}" if run['first_error'] else ''))
+    for name in ('latency', 'service_time'):
+        stats = run[name]
+        if stats is None:
+            continue
+        print(f"{name.replace('_', ' ').capitalize():<13} p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, "
+              f"p99 {stats['p99_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+    if run['latency'] is not None:
+        largest = max(run['latency']['histogram'].values())
+        for bucket, count in run['latency']['histogram'].items():
+            if count:
+                print(f"  {bucket:>10} {count:>8}  {'#' * max(1, round(40 * count / largest))}")
+    scorer = run['scorer']
+    cpu = f"{scorer['cpu_seconds']:.2f} CPU seconds ({scorer['cpu_utilization']:.0%} of one core)" \
+        if scorer['cpu_seconds'] is not None else 'CPU unavailable'
+    memory = f"peak RSS {scorer['peak_rss_mb']:.0f} MB" if scorer['peak_rss_mb'] is not None else 'memory unavailable'
+    if scorer['rss_mb'] is not None:
+        memory = f"RSS {scorer['rss_mb']:.0f} MB, {memory}"
+    if scorer['memory_measured'] == scorer['measured']:
+        print(f"Scorer ({scorer['measured']}): {cpu}, {memory}")
+    else:
+        print(f"Scorer ({scorer['measured']}): {cpu}")
+        print(f"Memory ({scorer['memory_measured']}): {memory}")
+
+def compare(results, baseline):
+    """Print latency and throughput of this run against an earlier one."""
+    print(f"\nComparison with {baseline['meta']['model'].get('version') or 'unversioned model'} "
+          f"({baseline['meta']['timestamp']}) -> {results['meta']['model'].get('version') or 'unversioned model'}:")
+    for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+        before = (baseline['results']['latency'] or {}).get(key)
+        after = (results['results']['latency'] or {}).get(key)
+        if before and after:
+            print(f"  latency {key[:-3]:<4} {before:>9.2f} ms -> {after:>9.2f} ms  {after / before:>6.2f}x")
+    before = baseline['results']['throughput']
+    after = results['results']['throughput']
+    if before:
+        print(f"  throughput   {before:>9,.0f}/s  -> {after:>9,.0f}/s   {after / before:>6.2f}x")
+    print(f"  error rate   {baseline['results']['error_rate']:>9.2%}    -> {results['results']['error_rate']:>9.2%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay messages against the scoring path at a target rate.')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to replay messages from (default: mail_data.csv)')
+    parser.add_argument('--scale', type=int, default=1, help='Expand the dataset this many times with shuffled-word variants (default: 1)')
+    parser.add_argument('--qps', type=float, default=200, help='Target requests per second, 0 for as fast as possible (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients (default: 16)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load at the target rate (default: 10)')
+    parser.add_argument('--requests', type=int, help='Requests to send, instead of --duration (required with --qps 0)')
+    parser.add_argument('--warmup', type=int, default=100, help='Requests sent and discarded before measuring (default: 100)')
+    parser.add_argument('--spawn', action='store_true', help='Start scoring_server.py in a subprocess and load it over HTTP')
+    parser.add_argument('--url', help='Load a running scoring server at this URL instead')
+    parser.add_argument('--pid', type=int, help='Process id of the server at --url, to measure its CPU and memory')
+    parser.add_argument('--cache-size', type=int, default=100000, help='Prediction cache of the in-process or spawned scorer, 0 to disable (default: 100000)')
+    parser.add_argument('--no-cascade', action='store_true', help='Score every message with the full model in the in-process or spawned scorer')
+    parser.add_argument('--output', default='load_results.json', help='Where to write the results (default: load_results.json)')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    if args.requests is None and args.qps <= 0:
+        parser.error('--qps 0 needs --requests')
+    total = args.requests if args.requests is not None else int(args.qps * args.duration)
+
+    corpus = synthetic_corpus(load_corpus(args.data), args.scale)
+    messages = corpus['message'].sample(frac=1, random_state=42).tolist()
+
+    if args.url:
+        target = HTTPTarget(args.url, args.pid)
+        measured = f'process {args.pid}' if args.pid else 'not measured'
+    elif args.spawn:
+        target = spawn_server(args.cache_size, not args.no_cascade)
+        measured = f'scoring_server.py process {target.pid}'
+    else:
+        target = InProcessTarget(args.cache_size, not args.no_cascade)
+        measured = 'micro-batcher thread'
+    # Threads share their process's memory, so in process only the whole load generator can be measured
+    memory_measured = 'load generator process' if target.pid is None and target.tid is not None else measured
+    try:
+        if args.warmup:
+            run_load(target, messages, args.warmup, 0, args.concurrency)
+        measurable = target.pid is not None or target.tid is not None
+        cpu_before = cpu_seconds(target.pid, target.tid) if measurable else None
+        latencies, service_times, errors, elapsed = run_load(target, messages, total, args.qps, args.concurrency)
+        cpu_after = cpu_seconds(target.pid, target.tid) if measurable else None
+        rss, peak_rss = memory_mb(target.pid) if measurable else (None, None)
+    finally:
+        target.close()
+
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'target': args.url or ('spawned server' if args.spawn else 'in-process'),
+            'dataset': args.data,
+            'scale': args.scale,
+            'messages': len(messages),
+            'qps': args.qps,
+            'concurrency': args.concurrency,
+            'cache_size': args.cache_size,
+            'cascade': not args.no_cascade,
+            'model': model_version(),
+        },
+        'results': {
+            'requests': total,
+            'elapsed_seconds': elapsed,
+            'throughput': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'errors': len(errors),
+            'error_rate': len(errors) / total if total else 0.0,
+            'first_error': errors[0] if errors else None,
+            'latency': summarize(latencies),
+            'service_time': summarize(service_times),
+            'scorer': {
+                'measured': measured,
+                'cpu_seconds': cpu,
+                'cpu_utilization': cpu / elapsed if cpu is not None and elapsed > 0 else None,
+                'memory_measured': memory_measured,
+                'rss_mb': rss,
+                'peak_rss_mb': peak_rss,
+            },
+        },
+    }
+
+    print_results(results)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
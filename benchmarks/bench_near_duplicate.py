@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Recall and latency benchmark for the near-duplicate spam index.
+
+Builds the index from the spam in train_model's training split and measures:
+  - recall on campaign variants: training spam with a few words replaced,
+    the way campaigns change a name, a number or a URL
+  - hits on the held out test split: spam caught without the model, and ham
+    wrongly matched (false positives)
+  - latency of an index lookup against cv.transform + svm.predict, per message
+    and in batches
+
+Usage (from the project root):
+    python benchmarks/bench_near_duplicate.py
+    python benchmarks/bench_near_duplicate.py --thresholds 0.6 0.8 0.9 --edits 1 2 4
+    python benchmarks/bench_near_duplicate.py --shingle-size 3 --bands 16
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from near_duplicate import NearDuplicateIndex
+from spam_detector import load_preprocessed_corpus
+
+def make_variants(messages, edits, seed=42):
+    """Replace edits random words of each message with a token never seen before."""
+    rng = np.random.default_rng(seed)
+    variants = []
+    for number, message in enumerate(messages):
+        words = message.split()
+        for position in rng.choice(len(words), size=min(edits, len(words)), replace=False):
+            words[position] = f'variant{number}x{position}'
+        variants.append(' '.join(words))
+    return variants
+
+def time_per_message(function, messages, batch_size):
+    """Return the mean seconds per message when scoring messages in batches of batch_size."""
+    start = time.perf_counter()
+    for offset in range(0, len(messages), batch_size):
+        function(messages[offset:offset + batch_size])
+    return (time.perf_counter() - start) / len(messages)
+
+def main():
+    from sklearn.model_selection import train_test_split
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.svm import LinearSVC
+
+    parser = argparse.ArgumentParser(description='Benchmark recall and latency of the near-duplicate spam index.')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to benchmark (default: mail_data.csv)')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.6, 0.7, 0.8, 0.9], help='Match thresholds to evaluate')
+    parser.add_argument('--edits', type=int, nargs='+', default=[1, 2, 3], help='Words replaced per campaign variant')
+    parser.add_argument('--shingle-size', type=int, default=2, help='Words per shingle (default: 2)')
+    parser.add_argument('--bands', type=int, default=32, help='LSH bands of the 128 hash signature (default: 32)')
+    parser.add_argument('--min-words', type=int, default=10, help='Only build variants of messages with at least this many words (default: 10)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 256], help='Batch sizes for the latency comparison')
+    args = parser.parse_args()
+
+    df, _, _ = load_preprocessed_corpus(args.data)
+    x_train, x_test, y_train, y_test = train_test_split(df['message'], df['spam'], test_size=0.3, random_state=42)
+    train_spam = x_train[y_train == 1].tolist()
+    test_spam = x_test[y_test == 1].tolist()
+    test_ham = x_test[y_test == 0].tolist()
+    long_spam = [message for message in train_spam if len(message.split()) >= args.min_words]
+
+    cv = CountVectorizer()
+    svm = LinearSVC().fit(cv.fit_transform(x_train), y_train)
+    model_caught = svm.predict(cv.transform(test_spam)) == 1
+
+    print(f"Index built from {len(train_spam)} training spam messages; variants of the {len(long_spam)} "
+          f"with at least {args.min_words} words.\n")
+    edit_columns = ''.join(f"{f'{edits} edit':>9}" for edits in args.edits)
+    print(f"{'threshold':>9} {'entries':>8} {'build (s)':>10}{edit_columns} {'test spam':>10} {'only index':>11} {'ham FP':>8}")
+    for threshold in args.thresholds:
+        start = time.perf_counter()
+        index = NearDuplicateIndex(bands=args.bands, threshold=threshold, shingle_size=args.shingle_size)
+        index.add(train_spam)
+        build_time = time.perf_counter() - start
+
+        recalls = ''
+        for edits in args.edits:
+            matches = index.match(make_variants(long_spam, edits))
+            recalls += f"{np.mean([m is not None for m in matches]):>9.1%}"
+        spam_hits = np.array([m is not None for m in index.match(test_spam)])
+        ham_hits = sum(m is not None for m in index.match(test_ham))
+        # Test spam the index catches that the model misses
+        only_index = int((spam_hits & ~model_caught).sum())
+        print(f"{threshold:>9.2f} {len(index):>8} {build_time:>10.3f}{recalls} {spam_hits.mean():>10.1%} "
+              f"{only_index:>11} {ham_hits:>8}")
+
+    index = NearDuplicateIndex(bands=args.bands, shingle_size=args.shingle_size)
+    index.add(train_spam)
+    messages = x_test.tolist()
+    print(f"\n{'batch':>6} {'index (us/msg)':>15} {'model (us/msg)':>15}")
+    for batch_size in args.batch_sizes:
+        lookup = time_per_message(index.match, messages, batch_size)
+        model = time_per_message(lambda batch: svm.predict(cv.transform(batch)), messages, batch_size)
+        print(f"{batch_size:>6} {lookup * 1e6:>15.1f} {model * 1e6:>15.1f}")
+
+if __name__ == "__main__":
+    main()
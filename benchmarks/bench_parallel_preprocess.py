@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for multi-process preprocess_data.
+Runs preprocess_data on synthetic corpora built from mail_data.csv with each
+number of workers and reports the wall time, the speedup and parallel
+efficiency over one worker, and whether the preprocessed messages, the
+lemma table and the term counts are identical to the single-process run.
+
+Usage (from the project root):
+    python benchmarks/bench_parallel_preprocess.py
+    python benchmarks/bench_parallel_preprocess.py --scales 10 100 --workers 1 2 4 8 --repeat 3
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_preprocess import load_corpus, synthetic_corpus, time_function
+from spam_detector import preprocess_data
+
+def same_output(reference, result):
+    """True if two (df, normalizer, term_frequency) results are identical."""
+    df, normalizer, term_frequency = result
+    ref_df, ref_normalizer, ref_term_frequency = reference
+    return (df['message'].equals(ref_df['message'])
+            and normalizer.lemmas == ref_normalizer.lemmas
+            and normalizer.most_freq_words == ref_normalizer.most_freq_words
+            and normalizer.least_freq_words == ref_normalizer.least_freq_words
+            and list(term_frequency.items()) == list(ref_term_frequency.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how preprocess_data scales with worker processes.')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to benchmark (default: mail_data.csv)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10], help='Corpus sizes as multiples of the dataset (default: 10)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Worker counts to measure (default: 1 2 4 8)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per measurement; the best time is reported (default: 1)')
+    args = parser.parse_args()
+
+    base = load_corpus(args.data)
+    print(f"{os.cpu_count()} CPUs available")
+
+    print(f"\n{'scale':>6} {'rows':>10} {'workers':>8} {'time (s)':>10} {'speedup':>9} {'efficiency':>11}  identical")
+    for scale in args.scales:
+        corpus = synthetic_corpus(base, scale)
+        serial_time, reference = time_function(lambda df: preprocess_data(df, return_artifacts=True), corpus, args.repeat)
+        for workers in args.workers:
+            if workers == 1:
+                seconds, result = serial_time, reference
+            else:
+                seconds, result = time_function(lambda df: preprocess_data(df, return_artifacts=True, workers=workers),
+                                                corpus, args.repeat)
+            speedup = serial_time / seconds
+            print(f"{scale:>5}x {len(corpus):>10} {workers:>8} {seconds:>10.3f} {speedup:>8.2f}x "
+                  f"{speedup / workers:>10.0%}  {same_output(reference, result)}")
+
+if __name__ == "__main__":
+    main()
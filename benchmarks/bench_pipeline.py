@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the training and scoring pipeline.
+Builds synthetic corpora from mail_data.csv at several scales and measures the
+wall time and peak memory of each stage: read_data_file (parsing the CSV,
+and memory-mapping the Feather copy from convert_data.py when pyarrow is
+installed), preprocess_data, vectorizer fit, LinearSVC fit, cv.transform and svm.predict. Scoring is also
+measured as single-message latency and batch throughput.
+
+Results are written as JSON and can be compared against a stored baseline.
+
+Usage (from the project root):
+    python benchmarks/bench_pipeline.py --scales 1 10 100 --output results.json
+    python benchmarks/bench_pipeline.py --baseline baseline.json --fail-on-regression
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_preprocess import load_corpus, synthetic_corpus
+from spam_detector import read_data_file, preprocess_data
+from convert_data import binary_dataset_path, has_pyarrow, write_binary_dataset
+
+def measure(function, memory=True):
+    """
+    Run function and return (result, seconds, peak_mb). The timed run is done
+    without tracemalloc, and peak memory is measured in a second traced run,
+    so tracing overhead does not distort the timings.
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        function()
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+def stage_result(seconds, peak_mb, items):
+    return {
+        'seconds': seconds,
+        'peak_mb': peak_mb,
+        'items': items,
+        'items_per_second': items / seconds if seconds > 0 else None,
+    }
+
+def bench_scale(base, scale, memory=True, latency_samples=1000):
+    """Run every stage on a corpus scale times the size of base."""
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.svm import LinearSVC
+
+    corpus = synthetic_corpus(base, scale)
+    rows = len(corpus)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'corpus.csv')
+        corpus.rename(columns={'spam': 'Category', 'message': 'Message'}).to_csv(path, index=False)
+        _, seconds, peak = measure(lambda: read_data_file(path), memory)
+        results['read_data_file'] = stage_result(seconds, peak, rows)
+        if has_pyarrow():
+            write_binary_dataset(read_data_file(path), binary_dataset_path(path), source=path)
+            _, seconds, peak = measure(lambda: read_data_file(path), memory)
+            results['read_feather'] = stage_result(seconds, peak, rows)
+
+    df, seconds, peak = measure(lambda: preprocess_data(corpus.copy()), memory)
+    results['preprocess_data'] = stage_result(seconds, peak, rows)
+    messages = df['message']
+    labels = (df['spam'] == 'spam').astype(int).to_numpy()
+
+    cv = CountVectorizer()
+    x, seconds, peak = measure(lambda: cv.fit_transform(messages), memory)
+    results['vectorizer_fit'] = stage_result(seconds, peak, rows)
+
+    svm = LinearSVC()
+    _, seconds, peak = measure(lambda: svm.fit(x, labels), memory)
+    results['svm_fit'] = stage_result(seconds, peak, rows)
+
+    x, seconds, peak = measure(lambda: cv.transform(messages), memory)
+    results['transform'] = stage_result(seconds, peak, rows)
+
+    _, seconds, peak = measure(lambda: svm.predict(x), memory)
+    results['predict'] = stage_result(seconds, peak, rows)
+
+    # Scoring one message at a time, as test_model.check_spam and the GUI do
+    sample = messages.sample(min(latency_samples, rows), random_state=42).tolist()
+    latencies = []
+    for message in sample:
+        start = time.perf_counter()
+        svm.predict(cv.transform([message]))
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    results['single_message'] = {
+        'samples': len(sample),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+    # Batch scoring throughput, transform and predict together
+    _, seconds, peak = measure(lambda: svm.predict(cv.transform(messages)), memory)
+    results['batch_scoring'] = stage_result(seconds, peak, rows)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Print the time ratio of each stage against the baseline and return the
+    list of stages that slowed down by more than threshold.
+    """
+    regressions = []
+    print(f"\nComparison with baseline (regression threshold {threshold:.0%}):")
+    for scale, stages in results['scales'].items():
+        base_stages = baseline.get('scales', {}).get(scale)
+        if base_stages is None:
+            continue
+        for stage, values in stages.items():
+            key = 'p50_ms' if stage == 'single_message' else 'seconds'
+            if stage not in base_stages or not base_stages[stage].get(key):
+                continue
+            ratio = values[key] / base_stages[stage][key]
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = '  REGRESSION'
+                regressions.append(f"{scale}x {stage}")
+            print(f"  {scale + 'x':>5} {stage:<16} {ratio:>6.2f}x{flag}")
+    return regressions
+
+def print_results(results):
+    for scale, stages in results['scales'].items():
+        print(f"\n{scale}x corpus:")
+        print(f"  {'stage':<16} {'seconds':>9} {'peak MB':>9} {'items/s':>12}")
+        for stage, values in stages.items():
+            if stage == 'single_message':
+                print(f"  {stage:<16} p50 {values['p50_ms']:.3f} ms  p95 {values['p95_ms']:.3f} ms  "
+                      f"p99 {values['p99_ms']:.3f} ms")
+                continue
+            peak = f"{values['peak_mb']:.1f}" if values['peak_mb'] is not None else '-'
+            rate = f"{values['items_per_second']:,.0f}" if values['items_per_second'] else '-'
+            print(f"  {stage:<16} {values['seconds']:>9.3f} {peak:>9} {rate:>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each stage of the spam detection pipeline.')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to build the corpora from (default: mail_data.csv)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help='Corpus sizes as multiples of the dataset (default: 1 10 100)')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the traced runs that measure peak memory')
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the results (default: bench_results.json)')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Slowdown counted as a regression (default: 0.2 = 20%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with an error if any stage regressed')
+    args = parser.parse_args()
+
+    base = load_corpus(args.data)
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dataset': args.data,
+            'dataset_rows': len(base),
+        },
+        'scales': {},
+    }
+    for scale in args.scales:
+        print(f"Benchmarking {scale}x corpus ({len(base) * scale} messages)...")
+        results['scales'][str(scale)] = bench_scale(base, scale, memory=not args.no_memory)
+
+    print_results(results)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            print(f"\nFAIL: {len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
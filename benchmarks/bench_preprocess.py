@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark for spam_detector.preprocess_data.
+Compares the original per-row implementation against the vectorized,
+memoized one on mail_data.csv and on a synthetic corpus built from it.
+
+Usage (from the project root):
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --scales 1 10 100 --repeat 3
+    python benchmarks/bench_preprocess.py --scales 10 --memory
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.stem import WordNetLemmatizer
+from spam_detector import preprocess_data, read_data_file
+
+def preprocess_data_legacy(df):
+    """The original preprocess_data, kept as the benchmark baseline."""
+    df['message'] = df['message'].str.lower()
+    df['message'] = df['message'].apply(lambda x: re.sub("[^'.,a-z0-9 ]+", " ", x))
+    lem = WordNetLemmatizer()
+    df['message'] = df['message'].apply(lambda x: ' '.join([lem.lemmatize(i, pos='v') for i in x.split()]))
+    term_frequency = pd.Series(' '.join(df['message']).split()).value_counts()
+    most_freq_words = term_frequency.head(20)
+    least_freq_words = term_frequency[term_frequency <= 1]
+    df['message'] = df['message'].apply(lambda x: ' '.join([word for word in x.split() if word not in most_freq_words]))
+    df['message'] = df['message'].apply(lambda x: ' '.join([word for word in x.split() if word not in least_freq_words]))
+    return df
+
+def load_corpus(file_path):
+    """Read the dataset and rename its columns the way train_model does."""
+    df = read_data_file(file_path)
+    if 'Category' in df.columns and 'Message' in df.columns:
+        df.columns = ['spam', 'message']
+    return df
+
+def synthetic_corpus(df, scale, seed=42):
+    """
+    Build a corpus scale times larger than df by resampling messages and
+    shuffling their words, so the vocabulary and frequencies stay realistic
+    without every row being an exact duplicate.
+    """
+    if scale == 1:
+        return df.copy()
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(df), size=len(df) * scale)
+    messages = []
+    for message in df['message'].to_numpy()[rows]:
+        words = message.split()
+        rng.shuffle(words)
+        messages.append(' '.join(words))
+    return pd.DataFrame({'spam': df['spam'].to_numpy()[rows], 'message': messages})
+
+def time_function(function, df, repeat):
+    """Return the best wall time over repeat runs and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        data = df.copy()
+        start = time.perf_counter()
+        result = function(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def peak_memory_mb(function, df):
+    """Return the peak traced memory of one run, in MB."""
+    data = df.copy()
+    tracemalloc.start()
+    function(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark preprocess_data against the original implementation.')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to benchmark (default: mail_data.csv)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100], help='Corpus sizes as multiples of the dataset (default: 1 100)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per measurement; the best time is reported (default: 1)')
+    parser.add_argument('--memory', action='store_true', help='Also measure peak memory in an extra traced run of each')
+    args = parser.parse_args()
+
+    base = load_corpus(args.data)
+
+    memory_columns = f" {'legacy MB':>10} {'new MB':>8}" if args.memory else ''
+    print(f"\n{'scale':>6} {'rows':>10} {'legacy (s)':>12} {'new (s)':>10} {'speedup':>9}{memory_columns}  match")
+    for scale in args.scales:
+        corpus = synthetic_corpus(base, scale)
+        legacy_time, legacy = time_function(preprocess_data_legacy, corpus, args.repeat)
+        new_time, new = time_function(preprocess_data, corpus, args.repeat)
+        match = legacy['message'].equals(new['message'])
+        memory = ''
+        if args.memory:
+            memory = f" {peak_memory_mb(preprocess_data_legacy, corpus):>10.1f} {peak_memory_mb(preprocess_data, corpus):>8.1f}"
+        print(f"{scale:>5}x {len(corpus):>10} {legacy_time:>12.3f} {new_time:>10.3f} {legacy_time / new_time:>8.1f}x{memory}  {match}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load test for the SMTP front-end.
+
+Starts smtp_server's receiver in-process on a free port (or targets a running
+one with --connect) and sends messages from mail_data.csv with many concurrent
+smtplib clients. Reports throughput, client-side latency per message, whether
+every verdict matches scoring the same message directly, and the server's own
+counters.
+
+Usage (from the project root):
+    python benchmarks/bench_smtp.py --messages 2000 --clients 32
+    python benchmarks/bench_smtp.py --connect localhost:2525 --per-connection 10
+"""
+
+import os
+import sys
+import time
+import asyncio
+import smtplib
+import argparse
+import threading
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smtp_server import SMTPFrontend, start_server, parse_address, percentiles
+from mail_ingest import message_text
+from scoring_server import MicroBatcher
+from test_model import load_model_version
+from spam_detector import read_data_file
+
+def build_message(number, text):
+    message = EmailMessage()
+    message['From'] = 'sender@example.com'
+    message['To'] = 'user@example.com'
+    message['Subject'] = f'Message {number}'
+    message.set_content(text)
+    return message.as_bytes()
+
+def run_client(address, messages):
+    """Send messages over one connection; returns a list of (latency, code, reply) per message."""
+    results = []
+    with smtplib.SMTP(*address, timeout=60) as client:
+        client.ehlo()
+        for data in messages:
+            start = time.perf_counter()
+            try:
+                client.sendmail('sender@example.com', ['user@example.com'], data)
+                code, reply = 250, ''
+            except smtplib.SMTPResponseException as e:
+                code, reply = e.smtp_code, e.smtp_error.decode('utf-8', errors='replace')
+            except smtplib.SMTPDataError as e:
+                code, reply = e.smtp_code, str(e.smtp_error)
+            results.append((time.perf_counter() - start, code, reply))
+    return results
+
+def start_in_thread(batcher, action):
+    """Run an SMTPFrontend on its own event loop thread; returns (frontend, address)."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def serve():
+        state['frontend'] = SMTPFrontend(batcher, 'bench.local', action)
+        server = await start_server(state['frontend'], '127.0.0.1', 0)
+        state['address'] = server.sockets[0].getsockname()[:2]
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True).start()
+    ready.wait()
+    return state['frontend'], state['address']
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the SMTP front-end.')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to send messages from (default: mail_data.csv)')
+    parser.add_argument('--messages', type=int, default=2000, help='Messages to send (default: 2000)')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent client connections (default: 32)')
+    parser.add_argument('--per-connection', type=int, default=20, help='Messages sent over each connection (default: 20)')
+    parser.add_argument('--connect', type=parse_address, help='Target a running server (HOST:PORT) instead of starting one')
+    args = parser.parse_args()
+
+    df = read_data_file(args.data)
+    df = df.sample(args.messages, replace=len(df) < args.messages, random_state=42)
+    messages = [build_message(number, text) for number, text in enumerate(df['Message'])]
+    frontend, address = None, args.connect
+    if not args.connect:
+        version = load_model_version()
+        batcher = MicroBatcher(version.cv, version.svm, normalizer=version.normalizer)
+        expected = [label == 'spam' for label in batcher.score([message_text(data) for data in messages])]
+        # Reject mode, so every verdict shows up in the reply code
+        frontend, address = start_in_thread(batcher, 'reject')
+    groups = [messages[i:i + args.per_connection] for i in range(0, len(messages), args.per_connection)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        results = [result for group in pool.map(lambda group: run_client(address, group), groups) for result in group]
+    elapsed = time.perf_counter() - start
+
+    latencies = percentiles([latency for latency, _, _ in results])
+    codes = [code for _, code, _ in results]
+    print(f"Sent {len(results)} messages over {len(groups)} connections with {args.clients} clients "
+          f"in {elapsed:.2f}s - {len(results) / elapsed:,.0f} messages/sec")
+    print(f"Client latency: p50 {latencies['p50_ms']:.2f} ms, p95 {latencies['p95_ms']:.2f} ms, p99 {latencies['p99_ms']:.2f} ms")
+    print("Replies: " + ', '.join(f"{code}: {codes.count(code)}" for code in sorted(set(codes))))
+    if frontend is not None:
+        mismatches = sum(spam != (code == 550) for spam, code in zip(expected, codes))
+        print(f"Verdicts differing from direct scoring: {mismatches}")
+        stats = frontend.stats.snapshot()
+        score = stats['score_latency']
+        print(f"Server scoring latency: p50 {score['p50_ms']:.2f} ms, p95 {score['p95_ms']:.2f} ms, p99 {score['p99_ms']:.2f} ms")
+        print(f"Server counters: {stats['connections']} connections, {stats['deferred']} deferred, {stats['refused']} refused")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the command line scoring path.
+Measures the wall time of `python test_model.py "<text>"` from process start
+to first prediction, and breaks the import cost down by top-level package
+using `python -X importtime`.
+
+Usage (from the project root):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --max-seconds 0.5 --json startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_TEXT = "URGENT! You have won a 1 week FREE membership in our prize jackpot! Txt CLAIM to 81010"
+
+# Packages that the scoring path should avoid importing when it can
+HEAVY_PACKAGES = ['sklearn', 'scipy', 'pandas', 'nltk', 'tkinter', 'matplotlib']
+
+def run_once(command):
+    """Run command in a fresh interpreter and return its wall time in seconds."""
+    start = time.perf_counter()
+    subprocess.run(command, cwd=PROJECT_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def import_breakdown(command):
+    """
+    Run command under -X importtime and return the cumulative import time in
+    seconds of each top-level package, largest first.
+    """
+    result = subprocess.run(command[:1] + ['-X', 'importtime'] + command[1:], cwd=PROJECT_ROOT,
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    totals = defaultdict(float)
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only top-level entries count, nested imports are already included in their parent's cumulative time
+        if name.startswith('  ') or not name.strip():
+            continue
+        name = name.strip()
+        totals[name.split('.')[0]] += int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start time of the command line scorer.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to time (default: 5)')
+    parser.add_argument('--top', type=int, default=15, help='Packages to show in the import breakdown (default: 15)')
+    parser.add_argument('--max-seconds', type=float, help='Exit with an error if the median time to first prediction exceeds this')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    command = [sys.executable, 'test_model.py', SAMPLE_TEXT]
+
+    # Warm the OS file cache so the runs measure interpreter and import cost, not disk reads
+    run_once(command)
+    times = [run_once(command) for _ in range(args.runs)]
+    breakdown = import_breakdown(command)
+    heavy = [name for name, _ in breakdown if name in HEAVY_PACKAGES]
+
+    median = statistics.median(times)
+    print(f"\nTime to first prediction over {args.runs} runs:")
+    print(f"  min {min(times):.3f}s   median {median:.3f}s   max {max(times):.3f}s")
+    print(f"\nImport time by top-level package (top {args.top}):")
+    for name, seconds in breakdown[:args.top]:
+        print(f"  {name:<30} {seconds * 1000:>9.1f} ms")
+    print(f"\nHeavy packages imported: {', '.join(heavy) if heavy else 'none'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'runs': times,
+                'median_seconds': median,
+                'imports': dict(breakdown),
+                'heavy_packages': heavy,
+            }, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"\nFAIL: median time to first prediction {median:.3f}s exceeds {args.max_seconds:.3f}s")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
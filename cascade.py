@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Two-stage cascade classifier for the Spam Email Detector project.
+
+Most mail is obviously ham or obviously spam. The first stage is a small
+linear model over the few hundred words with the largest LinearSVC weights,
+scored with a regex and a dict lookup per token, without building a sparse
+matrix or calling scikit-learn. Messages whose first-stage margin falls
+outside the calibrated thresholds are decided there; only the uncertain
+rest is escalated to the full vectorizer and LinearSVC.
+
+train_model fits the first stage on the training split, calibrates the
+thresholds on half of the held out split so that early exits agree with the
+full model, and reports the early-exit fraction and the accuracy impact on
+the other half. The cascade is saved next to the model and ignored once the
+model is retrained without it.
+
+Usage:
+    python cascade.py stats
+    python cascade.py query "Your email text here"
+"""
+
+import os
+import re
+import sys
+import time
+import pickle
+import argparse
+import threading
+from itertools import repeat
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+import numpy as np
+
+from instrumentation import stage
+
+CASCADE_PATH = 'spam_nlp/cascade.pkl'
+MODEL_PATHS = ('spam_nlp/cv.pkl', 'spam_nlp/svm.pkl')
+
+class CascadeClassifier:
+    """
+    First stage of the cascade: a token -> weight dict and an intercept,
+    with the margins below low (ham) and above high (spam) that exit early.
+    Tokenization matches CountVectorizer's, so the first stage sees the same
+    words as the full model.
+    """
+
+    def __init__(self, weights, intercept, low, high, token_pattern=r"(?u)\b\w\w+\b", lowercase=True):
+        self.weights = weights
+        self.intercept = float(intercept)
+        self.low = float(low)
+        self.high = float(high)
+        self.token_pattern = token_pattern
+        self.lowercase = lowercase
+        self.token_regex = re.compile(token_pattern)
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.early_exits = 0
+
+    def __len__(self):
+        return len(self.weights)
+
+    def margins(self, texts):
+        """Return the first-stage margin of each message."""
+        get = self.weights.get
+        findall = self.token_regex.findall
+        intercept = self.intercept
+        if self.lowercase:
+            return np.array([intercept + sum(map(get, findall(text.lower()), repeat(0.0))) for text in texts])
+        return np.array([intercept + sum(map(get, findall(text), repeat(0.0))) for text in texts])
+
+    def predict(self, texts, predict_fn):
+        """
+        Return predictions for texts: 1 or 0 for messages the first stage is
+        confident about, and predict_fn's result for the rest, which is
+        called once.
+        """
+        with stage('cascade', len(texts)):
+            margins = self.margins(texts)
+        predictions = [1 if margin > self.high else 0 if margin < self.low else None for margin in margins]
+        missing = [index for index, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            for index, prediction in zip(missing, predict_fn([texts[index] for index in missing])):
+                predictions[index] = int(prediction)
+        with self.lock:
+            self.messages += len(texts)
+            self.early_exits += len(texts) - len(missing)
+        return predictions
+
+    def stats(self):
+        with self.lock:
+            return {
+                'features': len(self.weights),
+                'low': self.low,
+                'high': self.high,
+                'messages': self.messages,
+                'early_exits': self.early_exits,
+                'early_exit_rate': self.early_exits / self.messages if self.messages else 0.0,
+            }
+
+    def to_dict(self):
+        return {
+            'version': 1,
+            'weights': dict(self.weights),
+            'intercept': self.intercept,
+            'low': self.low,
+            'high': self.high,
+            'token_pattern': self.token_pattern,
+            'lowercase': self.lowercase,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['weights'], data['intercept'], data['low'], data['high'], data['token_pattern'], data['lowercase'])
+
+    def save(self, path=CASCADE_PATH):
+        """Save the cascade as plain Python types."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Write to a temporary file first so readers never see a partial cascade
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self.to_dict(), f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=CASCADE_PATH):
+        with open(path, 'rb') as f:
+            return cls.from_dict(pickle.load(f))
+
+def load_cascade(path=CASCADE_PATH, model_paths=MODEL_PATHS):
+    """
+    Load the cascade. Returns None if it has not been calibrated, or if the
+    model was saved after it (by retrain.py or tune_model.py, say), since its
+    thresholds were calibrated against the previous model.
+    """
+    try:
+        if os.path.getmtime(path) < max(os.path.getmtime(model_path) for model_path in model_paths):
+            return None
+    except OSError:
+        return None
+    try:
+        return CascadeClassifier.load(path)
+    except Exception as e:
+        print(f"Error loading cascade: {e}")
+        return None
+
+def calibrate_thresholds(margins, reference, tolerance=0.0):
+    """
+    Return (low, high) for the first-stage margins of the calibration messages
+    and the full model's predictions for them. The thresholds are the widest
+    that keep the fraction of early exits disagreeing with the full model at
+    or below tolerance, with low <= 0 <= high.
+    """
+    margins = np.asarray(margins, dtype=np.float64)
+    reference = np.asarray(reference)
+
+    def widest(values, disagrees):
+        # Exit the n largest values, for the largest n whose disagreement rate is within tolerance
+        order = np.argsort(-values, kind='stable')
+        wrong = np.cumsum(disagrees[order])
+        within = np.flatnonzero(wrong <= tolerance * np.arange(1, len(order) + 1))
+        n = within[-1] + 1 if len(within) else 0
+        # Exits need a margin strictly above the first value left out, so ties are escalated
+        return values[order[n]] if n < len(order) else -np.inf
+
+    high = max(widest(margins, reference != 1), 0.0)
+    low = min(-widest(-margins, reference != 0), 0.0)
+    return float(low), float(high)
+
+def fit_cascade(cv, svm, x_train, y_train, calibration_texts, keep=250, tolerance=0.0):
+    """
+    Fit the first stage on the keep features with the largest |coef_| of svm,
+    using the vectorized training split x_train, and calibrate its thresholds
+    against svm on calibration_texts (preprocessed, held out messages).
+    """
+    from sklearn.svm import LinearSVC
+
+    kept = np.sort(np.argsort(-np.abs(svm.coef_).ravel(), kind='stable')[:keep])
+    first = LinearSVC().fit(x_train[:, kept], y_train)
+    weights = dict(zip(cv.get_feature_names_out()[kept].tolist(), first.coef_.ravel().tolist()))
+    cascade = CascadeClassifier(weights, first.intercept_[0], 0.0, 0.0, cv.token_pattern, cv.lowercase)
+
+    reference = svm.predict(cv.transform(calibration_texts))
+    cascade.low, cascade.high = calibrate_thresholds(cascade.margins(calibration_texts), reference, tolerance)
+    return cascade
+
+def evaluate_cascade(cascade, cv, svm, texts, labels):
+    """
+    Score texts with the full model and with the cascade and return the
+    early-exit fraction, both accuracies, their agreement and timings.
+    """
+    labels = np.asarray(labels)
+    start = time.perf_counter()
+    full = svm.predict(cv.transform(texts))
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    margins = cascade.margins(texts)
+    escalated = (margins >= cascade.low) & (margins <= cascade.high)
+    cascaded = (margins > cascade.high).astype(full.dtype)
+    if escalated.any():
+        cascaded[escalated] = svm.predict(cv.transform([text for text, flag in zip(texts, escalated) if flag]))
+    cascade_seconds = time.perf_counter() - start
+
+    return {
+        'messages': len(texts),
+        'early_exit_rate': float(1 - escalated.mean()),
+        'full_accuracy': float((full == labels).mean()),
+        'cascade_accuracy': float((cascaded == labels).mean()),
+        'agreement': float((cascaded == full).mean()),
+        'full_seconds': full_seconds,
+        'cascade_seconds': cascade_seconds,
+    }
+
+def print_evaluation(cascade, evaluation):
+    print(f"Cascade: {len(cascade)}-word first stage, exits below {cascade.low:.3f} (ham) and above {cascade.high:.3f} (spam)")
+    print(f"  Early exits:      {evaluation['early_exit_rate']:.1%} of {evaluation['messages']} held out messages")
+    print(f"  Accuracy:         {evaluation['cascade_accuracy']:.4f} cascade, {evaluation['full_accuracy']:.4f} full model "
+          f"({evaluation['cascade_accuracy'] - evaluation['full_accuracy']:+.4f})")
+    print(f"  Agreement:        {evaluation['agreement']:.2%} with the full model")
+    print(f"  Batch scoring:    {evaluation['cascade_seconds'] * 1000:.1f} ms cascade, "
+          f"{evaluation['full_seconds'] * 1000:.1f} ms full model")
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect the early-exit cascade calibrated by train_model.')
+    parser.add_argument('--cascade', help="Cascade file (default: the current model version's)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Print the thresholds and the heaviest words of the first stage')
+    query = subparsers.add_parser('query', help='Print the first-stage margin and decision for a message')
+    query.add_argument('text', help='Message to score')
+    args = parser.parse_args()
+
+    from model_store import current_file
+    if args.cascade is None:
+        args.cascade = current_file('cascade.pkl')
+    cascade = load_cascade(args.cascade, (current_file('cv.pkl'), current_file('svm.pkl')))
+    if cascade is None:
+        print(f"No current cascade at {args.cascade}. Train the model with spam_detector.py to calibrate one.")
+        sys.exit(1)
+
+    if args.command == 'stats':
+        print(f"{len(cascade)} words, exits below {cascade.low:.4f} (ham) and above {cascade.high:.4f} (spam)")
+        heaviest = sorted(cascade.weights.items(), key=lambda item: abs(item[1]), reverse=True)[:20]
+        for word, weight in heaviest:
+            print(f"  {word:<20} {weight:+.4f}")
+    else:
+        from preprocessing import load_normalizer
+        normalizer = load_normalizer(current_file('preprocess.pkl'))
+        texts = normalizer.transform([args.text]) if normalizer is not None else [args.text]
+        margin = float(cascade.margins(texts)[0])
+        if margin > cascade.high:
+            decision = 'spam (early exit)'
+        elif margin < cascade.low:
+            decision = 'ham (early exit)'
+        else:
+            decision = 'uncertain, escalated to the full model'
+        print(f"First-stage margin {margin:.4f}: {decision}")
+
+if __name__ == "__main__":
+    main()
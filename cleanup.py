@@ -25,42 +25,62 @@ if not check_venv():
     print("\nExiting. Please activate the virtual environment and try again.")
     sys.exit(1)
 
+# Files to keep
+FILES_TO_KEEP = [
+    "spam_detector.py",
+    "test_model.py",
+    "convert_data.py",
+    "requirements.txt",
+    "README.md",
+    "HOW_TO_RUN.md",
+    ".gitignore",
+    "mail_data.csv",
+    "mail_data.feather",
+    "cleanup.py",  # Keep this script
+    "run.py",  # Add run.py to the list of files to keep
+    "scoring_server.py",
+    "preprocessing.py",
+    "train_stream.py",
+    "compact_model.py",
+    "retrain.py",
+    "corpus_cache.py",
+    "tune_model.py",
+    "instrumentation.py",
+    "prediction_cache.py",
+    "near_duplicate.py",
+    "smtp_server.py",
+    "mail_ingest.py",
+    "prune_model.py",
+    "cascade.py",
+    "term_stats.py",
+    "fused_scorer.py",
+    "model_store.py"
+]
+
+# Directories to keep
+DIRS_TO_KEEP = [
+    "venv",
+    "spam_nlp",
+    "benchmarks",
+    "tests"
+]
+
 def cleanup_project():
     """Clean up the project directory by removing unnecessary files."""
     print("Cleaning up the Spam Email Detector project...")
     
-    # Files to keep
-    files_to_keep = [
-        "spam_detector.py",
-        "test_model.py",
-        "convert_data.py",
-        "requirements.txt",
-        "README.md",
-        "HOW_TO_RUN.md",
-        ".gitignore",
-        "mail_data.csv",
-        "cleanup.py",  # Keep this script
-        "run.py"  # Add run.py to the list of files to keep
-    ]
-    
-    # Directories to keep
-    dirs_to_keep = [
-        "venv",
-        "spam_nlp"
-    ]
-    
     # Get all files and directories in the current directory
     all_items = os.listdir(".")
     
     # Remove files that are not in the keep list
     for item in all_items:
-        if os.path.isfile(item) and item not in files_to_keep:
+        if os.path.isfile(item) and item not in FILES_TO_KEEP:
             print(f"Removing file: {item}")
             try:
                 os.remove(item)
             except Exception as e:
                 print(f"  Error removing {item}: {e}")
-        elif os.path.isdir(item) and item not in dirs_to_keep:
+        elif os.path.isdir(item) and item not in DIRS_TO_KEEP:
             print(f"Removing directory: {item}")
             try:
                 shutil.rmtree(item)
@@ -79,12 +99,10 @@ if __name__ == "__main__":
     # Ask for confirmation
     print("This script will remove all unnecessary files from the project.")
     print("The following files will be kept:")
-    for file in sorted(["spam_detector.py", "test_model.py", "convert_data.py", 
-                 "requirements.txt", "README.md", "HOW_TO_RUN.md", 
-                 ".gitignore", "mail_data.csv", "cleanup.py"]):
+    for file in sorted(FILES_TO_KEEP):
         print(f"  - {file}")
     print("\nThe following directories will be kept:")
-    for dir in sorted(["venv", "spam_nlp"]):
+    for dir in sorted(DIRS_TO_KEEP):
         print(f"  - {dir}/")
     
     confirm = input("\nDo you want to continue? (y/n): ")
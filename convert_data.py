@@ -1,4 +1,18 @@
+"""
+Data conversion utility for the Spam Email Detector project.
+
+Converts the mail_data spreadsheet or CSV into mail_data.csv and, when pyarrow
+is installed, into mail_data.feather: an uncompressed Arrow/Feather file with
+the Category column stored as a categorical and the size and SHA-256 of the
+CSV it was converted from in its schema metadata. read_data_file prefers the
+Feather file while the CSV still matches them and memory-maps it, which
+avoids parsing the CSV on every training run.
+"""
+
 import os
+import codecs
+import hashlib
+import importlib.util
 import pandas as pd
 import sys
 
@@ -19,9 +33,120 @@ if not check_venv():
     print("\nExiting. Please activate the virtual environment and try again.")
     sys.exit(1)
 
+DATASET_SUFFIX = '.feather'
+# Schema metadata keys recording the CSV a Feather dataset was converted from
+SOURCE_SIZE_KEY = b'source_size'
+SOURCE_SHA256_KEY = b'source_sha256'
+
+# Leading bytes of each binary format read_dataset understands; anything else is read as CSV
+MAGIC_NUMBERS = [
+    (b'ARROW1', 'feather'),
+    (b'PAR1', 'parquet'),
+    (b'PK\x03\x04', 'xlsx'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'xls'),
+]
+
+def has_pyarrow():
+    """True if pyarrow, needed for Feather/Parquet files and the fast CSV engine, is installed."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+def sniff_format(path):
+    """
+    Return (format, encoding) for path from its first bytes. format is
+    'feather', 'parquet', 'xlsx', 'xls' or 'csv'. encoding is None for the
+    binary formats; for CSV it is 'utf-8' if the start of the file decodes as
+    UTF-8 and 'latin-1' otherwise.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(1 << 16)
+    for magic, fmt in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return fmt, None
+    try:
+        # final=False, so a multi-byte character cut off at the end of head is not an error
+        codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=False)
+        return 'csv', 'utf-8'
+    except UnicodeDecodeError:
+        return 'csv', 'latin-1'
+
+def binary_dataset_path(path):
+    """Path of the Feather dataset convert_data.py writes next to the CSV at path."""
+    return os.path.splitext(path)[0] + DATASET_SUFFIX
+
+def source_metadata(path):
+    """Schema metadata identifying the contents of path: its size and SHA-256."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return {SOURCE_SIZE_KEY: str(os.path.getsize(path)).encode('ascii'),
+            SOURCE_SHA256_KEY: digest.hexdigest().encode('ascii')}
+
+def fresh_binary_dataset(path):
+    """
+    Return the Feather dataset next to path if it is readable and was converted
+    from the current contents of path, otherwise None. Editing the CSV (or
+    appending to it, as retrain.py does) makes the Feather file stale until
+    convert_data.py is run again, whatever the file times say.
+    """
+    binary_path = binary_dataset_path(path)
+    if binary_path == path or not os.path.exists(binary_path) or not has_pyarrow():
+        return None
+    if not os.path.exists(path):
+        return binary_path
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    try:
+        with pa.memory_map(binary_path) as source:
+            metadata = ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    # The size check is free; only hash the CSV when it could still match
+    if metadata.get(SOURCE_SIZE_KEY) != str(os.path.getsize(path)).encode('ascii'):
+        return None
+    if metadata.get(SOURCE_SHA256_KEY) != source_metadata(path)[SOURCE_SHA256_KEY]:
+        return None
+    return binary_path
+
+def read_dataset(path, fmt=None, encoding=None):
+    """Read a dataset in the given (or sniffed) format, memory-mapping binary formats."""
+    if fmt is None:
+        fmt, encoding = sniff_format(path)
+    if fmt == 'feather':
+        import pyarrow.feather as feather
+        return feather.read_table(path, memory_map=True).to_pandas()
+    if fmt == 'parquet':
+        return pd.read_parquet(path, memory_map=True)
+    if fmt == 'xlsx':
+        return pd.read_excel(path, engine='openpyxl')
+    if fmt == 'xls':
+        return pd.read_excel(path, engine='xlrd')
+    return pd.read_csv(path, encoding=encoding or 'utf-8', engine='pyarrow' if has_pyarrow() else 'c')
+
+def write_binary_dataset(df, path, source=None):
+    """
+    Write df to path as uncompressed Feather with a categorical Category
+    column. Uncompressed, so readers can memory-map it instead of decoding it.
+    With source, the file df was read from is recorded in the schema metadata,
+    so fresh_binary_dataset can tell whether it has changed since.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    if 'Category' in df.columns:
+        df = df.astype({'Category': 'category'})
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    if source is not None:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **source_metadata(source)})
+    # Write to a temporary file first so readers never see a partial dataset
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(table, temp_path, compression='uncompressed')
+    os.replace(temp_path, path)
+
 def convert_to_csv():
     """
-    Convert the mail_data file to a proper CSV format
+    Convert the mail_data file to a proper CSV format, plus a Feather copy for
+    fast loading when pyarrow is installed
     """
     print("Spam Email Detector - Data File Converter")
     print("----------------------------------------")
@@ -43,35 +168,29 @@ def convert_to_csv():
             print(f"  - {file}")
         return False
     
-    # Try to read the file as a CSV first
+    # Detect the format once from the file's first bytes instead of trying each reader in turn
+    fmt, encoding = sniff_format(found_file)
+    print(f"Detected format: {fmt}" + (f" ({encoding})" if encoding else ""))
     try:
-        with open(found_file, 'r', encoding='utf-8') as f:
-            first_line = f.readline().strip()
-            if ',' in first_line and first_line.startswith('Category'):
-                print(f"File is already a CSV file with header: {first_line}")
-                df = pd.read_csv(found_file)
-    except UnicodeDecodeError:
-        # If it's not a text file, try different methods
-        try:
-            print("Trying to read as Excel file...")
-            df = pd.read_excel(found_file, engine='openpyxl')
-        except Exception as e:
-            print(f"Failed with openpyxl: {e}")
-            try:
-                df = pd.read_excel(found_file, engine='xlrd')
-            except Exception as e:
-                print(f"Failed with xlrd: {e}")
-                try:
-                    df = pd.read_csv(found_file, encoding='latin-1')
-                except Exception as e:
-                    print(f"All reading methods failed: {e}")
-                    return False
+        df = read_dataset(found_file, fmt, encoding)
+    except Exception as e:
+        print(f"Could not read {found_file}: {e}")
+        return False
     
     # Save as CSV
     output_file = 'mail_data.csv'
-    print(f"Saving data to {output_file}...")
-    df.to_csv(output_file, index=False)
-    print(f"Successfully saved {len(df)} rows to {output_file}")
+    if found_file != output_file or encoding != 'utf-8':
+        print(f"Saving data to {output_file}...")
+        df.to_csv(output_file, index=False)
+        print(f"Successfully saved {len(df)} rows to {output_file}")
+    
+    # Save the binary copy read_data_file prefers
+    if has_pyarrow():
+        binary_file = binary_dataset_path(output_file)
+        print(f"Saving binary dataset to {binary_file}...")
+        write_binary_dataset(df, binary_file, source=output_file)
+    else:
+        print("pyarrow is not installed, skipping the binary dataset (pip install pyarrow)")
     print(f"Sample data:")
     print(df.head())
     
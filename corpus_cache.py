@@ -0,0 +1,121 @@
+"""
+On-disk cache of the preprocessed training corpus for the Spam Email Detector project.
+
+Entries are keyed by a hash of the dataset file contents plus the preprocessing
+configuration, so train_model can skip reading and preprocessing the dataset
+when neither has changed. Each entry is a single NPZ file holding the
+preprocessed messages as one UTF-8 buffer with row offsets, the binary labels,
+and the pickled normalizer and term frequencies.
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+
+import numpy as np
+
+from preprocessing import CLEAN_PATTERN, TextNormalizer
+from term_stats import TermCounts, TOP_WORDS_DROPPED, MAX_RARE_COUNT
+
+CACHE_DIR = 'spam_nlp/cache'
+
+# Bump when preprocess_data changes in a way that alters its output, or the entry format changes
+PREPROCESS_CONFIG = {
+    'version': 2,
+    'clean_pattern': CLEAN_PATTERN.pattern,
+    'lemmatizer': 'wordnet',
+    'lemma_pos': 'v',
+    'top_words_dropped': TOP_WORDS_DROPPED,
+    'max_rare_count': MAX_RARE_COUNT,
+}
+
+def corpus_key(file_path, config=PREPROCESS_CONFIG):
+    """Hash of the file contents and the preprocessing configuration."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f'{key}.npz')
+
+def has_cached_corpus(file_path, cache_dir=CACHE_DIR):
+    """True if a cache entry exists for the current contents of file_path."""
+    return os.path.exists(_entry_path(corpus_key(file_path), cache_dir))
+
+def load_cached_corpus(file_path, cache_dir=CACHE_DIR):
+    """
+    Return (df, normalizer, term_frequency) for file_path if it is cached,
+    otherwise None. df has the preprocessed 'message' column and the binary
+    'spam' column, as train_model builds them.
+    """
+    import pandas as pd
+
+    path = _entry_path(corpus_key(file_path), cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            buffer = data['messages'].tobytes()
+            offsets = data['offsets']
+            labels = data['labels']
+            artifacts = pickle.loads(data['artifacts'].tobytes())
+    except Exception as e:
+        print(f"Ignoring unreadable corpus cache entry {path}: {e}")
+        return None
+
+    messages = [buffer[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(labels))]
+    df = pd.DataFrame({'spam': labels.astype(np.int64), 'message': messages})
+    # Mark the entry as recently used for eviction
+    os.utime(path)
+    return df, TextNormalizer.from_dict(artifacts['normalizer']), TermCounts.from_dict(artifacts['term_frequency'])
+
+def store_cached_corpus(file_path, df, normalizer, term_frequency, cache_dir=CACHE_DIR, max_entries=5, max_age_days=30):
+    """Cache the preprocessed corpus for file_path, then evict stale entries."""
+    encoded = [message.encode('utf-8') for message in df['message']]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(message) for message in encoded], out=offsets[1:])
+    artifacts = pickle.dumps({'normalizer': normalizer.to_dict(), 'term_frequency': term_frequency.to_dict()})
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(corpus_key(file_path), cache_dir)
+    # Write to a temporary file first so readers never see a partial entry
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        np.savez(f,
+                 messages=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                 offsets=offsets,
+                 labels=df['spam'].to_numpy(dtype=np.int8),
+                 artifacts=np.frombuffer(artifacts, dtype=np.uint8))
+    os.replace(temp_path, path)
+    evict_cache(cache_dir, max_entries, max_age_days)
+    return path
+
+def evict_cache(cache_dir=CACHE_DIR, max_entries=5, max_age_days=30):
+    """
+    Remove entries not used for max_age_days, then the least recently used
+    entries beyond max_entries. Returns the number of entries removed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npz'):
+            path = os.path.join(cache_dir, name)
+            entries.append((os.path.getmtime(path), path))
+    entries.sort(reverse=True)
+
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for index, (mtime, path) in enumerate(entries):
+        if index >= max_entries or mtime < cutoff:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
@@ -0,0 +1,186 @@
+"""
+Per-stage timing and memory instrumentation for the Spam Email Detector project.
+
+Wrap a pipeline stage in `with stage('name') as s:` (or decorate a function
+with @instrumented('name')) to record its wall time, CPU time, peak memory and
+item count. Each finished stage is written as one JSON line and added to
+running totals that can be rendered in the Prometheus text format.
+
+Instrumentation is off by default and costs one global lookup per stage when
+disabled. Enable it with the SPAM_METRICS environment variable (a JSON lines
+file path, or '-' for stderr) or by calling configure(). Set
+SPAM_METRICS_MEMORY=1 to also trace peak Python memory per stage with
+tracemalloc, which slows the instrumented code noticeably. The tracemalloc
+peak is process-wide, so memory is only traced for stages run on the main
+thread; stages on other threads (the scoring servers' workers, say) record
+time only, and allocations made by other threads while a main-thread stage
+runs count towards its peak.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import functools
+import tracemalloc
+
+_enabled = False
+_trace_memory = False
+_output = None
+_lock = threading.Lock()
+_totals = {}
+_local = threading.local()
+
+class _NullStage:
+    """Stand-in returned by stage() when instrumentation is disabled."""
+
+    items = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class Stage:
+    """A running stage measurement; set .items to record how many items it handled."""
+
+    def __init__(self, name, items=None):
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.peak_bytes = None
+        # reset_peak() is process-wide: resetting it from another thread would corrupt the main thread's stages
+        self.trace_memory = (_trace_memory and tracemalloc.is_tracing()
+                             and threading.current_thread() is threading.main_thread())
+        if self.trace_memory:
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            self.child_peak = 0
+            tracemalloc.reset_peak()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        stack = _local.stack
+        stack.pop()
+        if self.trace_memory and tracemalloc.is_tracing():
+            # A nested stage resets the peak, so fold in the peak it saw
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            self.peak_bytes = max(peak - self.memory_start, 0)
+            if stack and stack[-1].trace_memory:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        _record(self.name, wall, cpu, self.peak_bytes, self.items, exc_type is not None)
+        return False
+
+def configure(output=None, trace_memory=False):
+    """
+    Enable instrumentation, writing JSON lines to output (a path, '-' for
+    stderr, or an open file). Pass output=None to only keep in-memory totals.
+    """
+    global _enabled, _trace_memory, _output
+    if isinstance(output, str):
+        output = sys.stderr if output == '-' else open(output, 'a', buffering=1)
+    _output = output
+    _trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+def disable():
+    """Turn instrumentation off. Totals recorded so far are kept."""
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def stage(name, items=None):
+    """Context manager measuring one pipeline stage."""
+    if not _enabled:
+        return _NULL_STAGE
+    return Stage(name, items)
+
+def instrumented(name):
+    """Decorator measuring every call of a function as a stage."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with Stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record(name, wall_seconds, items=None, failed=False):
+    """
+    Record a stage timed by the caller, such as one spanning awaits in async
+    code, where neither the stage stack nor the process CPU time apply.
+    """
+    if _enabled:
+        _record(name, wall_seconds, 0.0, None, items, failed)
+
+def _record(name, wall, cpu, peak_bytes, items, failed):
+    with _lock:
+        totals = _totals.setdefault(name, {
+            'calls': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'items': 0, 'peak_memory_bytes': 0,
+        })
+        totals['calls'] += 1
+        totals['errors'] += int(failed)
+        totals['wall_seconds'] += wall
+        totals['cpu_seconds'] += cpu
+        totals['items'] += items or 0
+        if peak_bytes is not None:
+            totals['peak_memory_bytes'] = max(totals['peak_memory_bytes'], peak_bytes)
+        if _output is not None:
+            _output.write(json.dumps({
+                'timestamp': time.time(),
+                'stage': name,
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'peak_memory_mb': peak_bytes / (1024 * 1024) if peak_bytes is not None else None,
+                'items': items,
+                'error': failed,
+            }) + '\n')
+
+def snapshot():
+    """Return a copy of the running totals per stage."""
+    with _lock:
+        return {name: dict(values) for name, values in _totals.items()}
+
+def render_prometheus():
+    """Render the running totals in the Prometheus text exposition format."""
+    metrics = [
+        ('spam_stage_calls_total', 'counter', 'Number of times the stage ran', 'calls'),
+        ('spam_stage_errors_total', 'counter', 'Number of times the stage raised an exception', 'errors'),
+        ('spam_stage_wall_seconds_total', 'counter', 'Wall-clock time spent in the stage', 'wall_seconds'),
+        ('spam_stage_cpu_seconds_total', 'counter', 'CPU time spent in the stage', 'cpu_seconds'),
+        ('spam_stage_items_total', 'counter', 'Items processed by the stage', 'items'),
+        ('spam_stage_peak_memory_bytes', 'gauge', 'Largest traced memory increase during the stage', 'peak_memory_bytes'),
+    ]
+    totals = snapshot()
+    lines = []
+    for metric, kind, description, key in metrics:
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for name in sorted(totals):
+            lines.append(f'{metric}{{stage="{name}"}} {totals[name][key]}')
+    return '\n'.join(lines) + '\n'
+
+# Enable from the environment, so existing scripts can be instrumented without changes
+if os.environ.get('SPAM_METRICS'):
+    configure(os.environ['SPAM_METRICS'], trace_memory=os.environ.get('SPAM_METRICS_MEMORY') == '1')
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Versioned model store for the Spam Email Detector project.
+
+Every trained model is published as its own directory under spam_nlp/models/
+holding cv.pkl, svm.pkl, preprocess.pkl, the early-exit cascade calibrated
+against that model (cascade.pkl), the near-duplicate index (spam_index.npz)
+and a manifest.json with the SHA-256 and size of each file, the vocabulary size, the number of corpus messages
+and the evaluation metrics. Publishing is atomic: the files are written to a
+temporary directory that is renamed into place, and then the CURRENT pointer
+file is replaced with os.replace. A reader sees either the old version or the
+new one, never a torn or mismatched pair.
+
+The files of the current version are also copied to spam_nlp/ for tools
+outside this project that read the model from there. Each copy is replaced
+atomically but not as a set, so the scripts here resolve files through the
+CURRENT pointer (see current_file and load_serving_model) and fall back to
+spam_nlp/ only when nothing has been published.
+
+Long-running scorers hold a ModelWatcher, which checks the pointer every few
+seconds on a background thread, loads a new version off the request path and
+swaps it in whole. The version it replaced stays loaded, so rolling back is
+instant.
+
+Usage:
+    python model_store.py list
+    python model_store.py rollback
+    python model_store.py activate 20261018-120000-1a2b3c4d
+    python model_store.py import
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import pickle
+import hashlib
+import argparse
+import threading
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+from preprocessing import save_normalizer, load_normalizer
+from cascade import CascadeClassifier, load_cascade
+from near_duplicate import NearDuplicateIndex, load_index, with_reported
+
+MODELS_DIR = 'spam_nlp/models'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+# Files a version can hold; the current version's are also copied to the directory above the store
+VERSION_FILES = ('cv.pkl', 'svm.pkl', 'preprocess.pkl', 'cascade.pkl', 'spam_index.npz')
+KEEP_VERSIONS = 5
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def legacy_path(file_name, models_dir=MODELS_DIR):
+    """Where the current version's copy of file_name is kept for tools that read fixed paths (spam_nlp/)."""
+    return os.path.join(os.path.dirname(os.path.normpath(models_dir)), file_name)
+
+def _replace_file(path, write):
+    """Write a file through write(f) to a temporary file and move it into place."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def classification_metrics(y_true, y_pred):
+    """Accuracy, and precision, recall and F1 of the spam class, for the manifest."""
+    import numpy as np
+
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    true_positives = int(((y_pred == 1) & (y_true == 1)).sum())
+    precision = true_positives / max(int((y_pred == 1).sum()), 1)
+    recall = true_positives / max(int((y_true == 1).sum()), 1)
+    return {
+        'accuracy': float((y_true == y_pred).mean()) if len(y_true) else 0.0,
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'test_messages': int(len(y_true)),
+    }
+
+def current_version_name(models_dir=MODELS_DIR):
+    """Return the name of the published version, or None if nothing has been published."""
+    try:
+        with open(os.path.join(models_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def current_file(file_name, models_dir=MODELS_DIR):
+    """Path of file_name in the current version, or in spam_nlp/ if nothing has been published."""
+    name = current_version_name(models_dir)
+    if name is None:
+        return legacy_path(file_name, models_dir)
+    return os.path.join(models_dir, name, file_name)
+
+def read_manifest(name, models_dir=MODELS_DIR):
+    with open(os.path.join(models_dir, name, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def list_versions(models_dir=MODELS_DIR):
+    """Return the names of the published versions, oldest first."""
+    if not os.path.isdir(models_dir):
+        return []
+    return sorted(name for name in os.listdir(models_dir)
+                  if not name.startswith('.') and os.path.exists(os.path.join(models_dir, name, MANIFEST_FILE)))
+
+def activate_version(name, models_dir=MODELS_DIR):
+    """
+    Make name the current version: replace the CURRENT pointer, then the
+    fixed-path copies of its files. Copies of files the version does not
+    have are removed, so a cascade calibrated against another model is
+    never left next to this one. Readers in this project follow the pointer,
+    so they never see the copies half replaced.
+    """
+    version_dir = os.path.join(models_dir, name)
+    if not os.path.exists(os.path.join(version_dir, MANIFEST_FILE)):
+        raise ValueError(f"No model version {name!r} in {models_dir}")
+    _replace_file(os.path.join(models_dir, CURRENT_FILE), lambda f: f.write(name.encode('utf-8')))
+    for file_name in VERSION_FILES:
+        source = os.path.join(version_dir, file_name)
+        target = legacy_path(file_name, models_dir)
+        if os.path.exists(source):
+            with open(source, 'rb') as src:
+                _replace_file(target, lambda f: shutil.copyfileobj(src, f))
+        elif os.path.exists(target):
+            os.remove(target)
+
+def publish_model(cv, svm, normalizer, metrics=None, n_messages=None, cascade=None, index=None,
+                  models_dir=MODELS_DIR, keep=KEEP_VERSIONS):
+    """
+    Write the model, with its cascade and near-duplicate index if given, to a
+    new version directory with its manifest, make it the current version and
+    prune all but the keep newest versions. Returns the manifest.
+    """
+    import sklearn
+
+    os.makedirs(models_dir, exist_ok=True)
+    temp_dir = os.path.join(models_dir, f'.publish.{os.getpid()}.tmp')
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    try:
+        for file_name, model in (('cv.pkl', cv), ('svm.pkl', svm)):
+            with open(os.path.join(temp_dir, file_name), 'wb') as f:
+                pickle.dump(model, f)
+        if normalizer is not None:
+            save_normalizer(normalizer, os.path.join(temp_dir, 'preprocess.pkl'))
+        if cascade is not None:
+            cascade.save(os.path.join(temp_dir, 'cascade.pkl'))
+        if index is not None:
+            index.save(os.path.join(temp_dir, 'spam_index.npz'))
+
+        files = {}
+        for file_name in sorted(os.listdir(temp_dir)):
+            path = os.path.join(temp_dir, file_name)
+            files[file_name] = {'sha256': _sha256(path), 'bytes': os.path.getsize(path)}
+        # Versions sort by creation time; the hash keeps names unique within a second
+        model_hash = hashlib.sha256(''.join(entry['sha256'] for entry in files.values()).encode('ascii')).hexdigest()
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{model_hash[:8]}"
+        manifest = {
+            'format': 1,
+            'version': name,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'previous': current_version_name(models_dir),
+            'files': files,
+            'vocabulary_size': len(getattr(cv, 'vocabulary_', ())),
+            'n_features': int(svm.coef_.shape[1]),
+            'corpus_messages': n_messages,
+            'metrics': metrics or {},
+            'sklearn_version': sklearn.__version__,
+        }
+        with open(os.path.join(temp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        # The version directory appears complete or not at all
+        os.rename(temp_dir, os.path.join(models_dir, name))
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    activate_version(name, models_dir)
+    prune_versions(models_dir, keep)
+    print(f"Published model version {name}")
+    return manifest
+
+def prune_versions(models_dir=MODELS_DIR, keep=KEEP_VERSIONS):
+    """Delete all but the keep newest versions, never the current one or the version it replaced."""
+    current = current_version_name(models_dir)
+    protected = {current}
+    if current is not None:
+        protected.add(read_manifest(current, models_dir).get('previous'))
+    for name in list_versions(models_dir)[:-keep or None]:
+        if name not in protected:
+            shutil.rmtree(os.path.join(models_dir, name), ignore_errors=True)
+
+class ModelVersion:
+    """The loaded files of one published version."""
+
+    def __init__(self, name, cv, svm, normalizer, manifest, cascade=None, index=None):
+        self.name = name
+        self.cv = cv
+        self.svm = svm
+        self.normalizer = normalizer
+        self.manifest = manifest
+        self.cascade = cascade
+        self.index = index
+
+def load_version(name, models_dir=MODELS_DIR):
+    """Load a version, checking every file against the hashes in its manifest."""
+    version_dir = os.path.join(models_dir, name)
+    manifest = read_manifest(name, models_dir)
+    for file_name, entry in manifest['files'].items():
+        if _sha256(os.path.join(version_dir, file_name)) != entry['sha256']:
+            raise ValueError(f"{file_name} of model version {name} does not match its manifest")
+    with open(os.path.join(version_dir, 'cv.pkl'), 'rb') as f:
+        cv = pickle.load(f)
+    with open(os.path.join(version_dir, 'svm.pkl'), 'rb') as f:
+        svm = pickle.load(f)
+    normalizer = load_normalizer(os.path.join(version_dir, 'preprocess.pkl'))
+    cascade = index = None
+    if 'cascade.pkl' in manifest['files']:
+        cascade = CascadeClassifier.load(os.path.join(version_dir, 'cascade.pkl'))
+    if 'spam_index.npz' in manifest['files']:
+        index = NearDuplicateIndex.load(os.path.join(version_dir, 'spam_index.npz'))
+    # Spam reported since the version was trained lives outside it (see near_duplicate.py)
+    return ModelVersion(name, cv, svm, normalizer, manifest, cascade, with_reported(index, normalizer))
+
+def load_current(models_dir=MODELS_DIR):
+    """Load the current version, or return None if nothing has been published."""
+    name = current_version_name(models_dir)
+    return load_version(name, models_dir) if name is not None else None
+
+def load_unversioned(models_dir=MODELS_DIR):
+    """
+    Load the model files in spam_nlp/ (the directory above the store) as an
+    unnamed ModelVersion, or return None if there is no model there.
+    """
+    model_paths = (legacy_path('cv.pkl', models_dir), legacy_path('svm.pkl', models_dir))
+    if not all(os.path.exists(path) for path in model_paths):
+        return None
+    with open(model_paths[0], 'rb') as f:
+        cv = pickle.load(f)
+    with open(model_paths[1], 'rb') as f:
+        svm = pickle.load(f)
+    normalizer = load_normalizer(legacy_path('preprocess.pkl', models_dir))
+    return ModelVersion(None, cv, svm, normalizer, {}, load_cascade(legacy_path('cascade.pkl', models_dir), model_paths),
+                        with_reported(load_index(legacy_path('spam_index.npz', models_dir)), normalizer))
+
+def load_serving_model(models_dir=MODELS_DIR):
+    """
+    Load the model to score with together with its normalizer, cascade and
+    index, all from one source: the current version, or the files in spam_nlp/
+    if nothing has been published. Returns None if there is no model.
+    """
+    if current_version_name(models_dir) is not None:
+        return load_current(models_dir)
+    return load_unversioned(models_dir)
+
+def rollback(models_dir=MODELS_DIR):
+    """Make the version the current one replaced current again. Returns its name."""
+    current = current_version_name(models_dir)
+    if current is None:
+        raise ValueError("No model version has been published")
+    previous = read_manifest(current, models_dir).get('previous')
+    if previous is None or not os.path.isdir(os.path.join(models_dir, previous)):
+        raise ValueError(f"Model version {current} has no previous version to roll back to")
+    activate_version(previous, models_dir)
+    return previous
+
+class ModelWatcher:
+    """
+    Keeps the current version of a model store loaded for a long-running
+    scorer. A background thread reads the CURRENT pointer every interval
+    seconds and, when it changes, loads the new version and swaps it in with
+    a single assignment; scorers read watcher.current once per batch, so a
+    batch is scored by one version from start to end. The replaced version
+    stays loaded as previous for rollback.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, interval=2.0):
+        self.models_dir = models_dir
+        self.interval = interval
+        self.current = load_current(models_dir)
+        if self.current is None:
+            raise ValueError(f"No model version has been published in {models_dir}")
+        self.previous = None
+        self.lock = threading.Lock()
+        self.reloads = 0
+        self.errors = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Swap in the published version if it changed. Returns True if it did."""
+        name = current_version_name(self.models_dir)
+        if name is None or name == self.current.name:
+            return False
+        try:
+            # Rolled back by another process: the previous version is still loaded
+            if self.previous is not None and name == self.previous.name:
+                version = self.previous
+            else:
+                version = load_version(name, self.models_dir)
+        except Exception as e:
+            # Keep serving the loaded version; the next check tries again
+            print(f"Error loading model version {name}: {e}")
+            self.errors += 1
+            return False
+        with self.lock:
+            self.previous, self.current = self.current, version
+            self.reloads += 1
+        print(f"Switched to model version {name}")
+        return True
+
+    def rollback(self):
+        """Swap the previous version back in immediately and publish it for other processes. Returns its name."""
+        with self.lock:
+            if self.previous is None:
+                raise ValueError("No previous model version is loaded")
+            self.previous, self.current = self.current, self.previous
+            name = self.current.name
+        activate_version(name, self.models_dir)
+        return name
+
+    def stats(self):
+        with self.lock:
+            return {
+                'version': self.current.name,
+                'previous': self.previous.name if self.previous is not None else None,
+                'metrics': self.current.manifest.get('metrics', {}),
+                'reloads': self.reloads,
+                'errors': self.errors,
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the published model versions.')
+    parser.add_argument('--models-dir', default=MODELS_DIR, help=f'Model store directory (default: {MODELS_DIR})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List the published versions with their metrics')
+    subparsers.add_parser('rollback', help='Make the version the current one replaced current again')
+    activate_parser = subparsers.add_parser('activate', help='Make a published version current')
+    activate_parser.add_argument('name', help='Version name, as printed by list')
+    subparsers.add_parser('import', help='Publish the model files in spam_nlp/ as a new version')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            current = current_version_name(args.models_dir)
+            versions = list_versions(args.models_dir)
+            if not versions:
+                print(f"No model versions in {args.models_dir}. Train a model or run 'python model_store.py import'.")
+            for name in versions:
+                manifest = read_manifest(name, args.models_dir)
+                line = f"{'*' if name == current else ' '} {name}  {manifest['vocabulary_size']:>7} words"
+                if 'accuracy' in manifest['metrics']:
+                    line += f"  accuracy {manifest['metrics']['accuracy']:.4f}"
+                print(line)
+        elif args.command == 'rollback':
+            print(f"Rolled back to model version {rollback(args.models_dir)}")
+        elif args.command == 'activate':
+            activate_version(args.name, args.models_dir)
+            print(f"Model version {args.name} is now current")
+        else:
+            version = load_unversioned(args.models_dir)
+            if version is None:
+                raise ValueError(f"No model files to import next to {args.models_dir}")
+            publish_model(version.cv, version.svm, version.normalizer, cascade=version.cascade, index=version.index,
+                          models_dir=args.models_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate index of known spam for the Spam Email Detector project.
+
+Spam campaigns send many variants of one message that differ only in a name,
+a number or a URL, which the exact-match prediction cache cannot recognize.
+Each preprocessed message is reduced to a MinHash signature over its word
+shingles, and the signature is split into bands that are hashed into LSH
+buckets. A message that shares a bucket with known spam, and whose signature
+agrees with it closely enough, is classified as spam without running the
+vectorizer and model.
+
+The index is built from the spam in the training data, grows incrementally as
+spam is confirmed, and is saved as a single NPZ file; the LSH buckets are
+rebuilt from the signatures when it is loaded.
+
+Spam confirmed in production is also kept, as raw messages, in a separate
+store (spam_nlp/reported_spam.npz) that no retrain replaces. It is merged into
+the index of every model version when the version is loaded, and into the
+index that training publishes.
+
+Usage:
+    python near_duplicate.py build [mail_data.csv]
+    python near_duplicate.py add confirmed_spam.txt
+    python near_duplicate.py query "Your email text here"
+"""
+
+import os
+import sys
+import zlib
+import argparse
+import threading
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+import numpy as np
+
+from instrumentation import stage
+
+INDEX_PATH = 'spam_nlp/spam_index.npz'
+REPORTED_PATH = 'spam_nlp/reported_spam.npz'
+
+# Messages hashed per block, bounding the (shingles x num_perm) hash matrix
+SIGNATURE_BLOCK = 512
+
+def shingle_hashes(text, size=2):
+    """CRC32 hashes of the word size-grams of text; shorter texts are one shingle."""
+    words = text.encode('utf-8').split()
+    if len(words) <= size:
+        return {zlib.crc32(b' '.join(words))} if words else set()
+    return set(map(zlib.crc32, map(b' '.join, zip(*(words[i:] for i in range(size))))))
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of spam messages.
+
+    Signatures have num_perm hashes split into bands of num_perm // bands rows.
+    Two messages become candidates when every row of at least one band agrees,
+    and a candidate is a match when the fraction of agreeing hashes (an
+    estimate of the Jaccard similarity of their shingle sets) is at least
+    threshold. With the defaults (word bigrams, 32 bands of 4 rows), pairs
+    sharing 70% of their shingles become candidates with a probability above
+    99%, and campaign variants with one word changed are matched.
+    """
+
+    def __init__(self, num_perm=128, bands=32, threshold=0.7, shingle_size=2, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.seed = seed
+        # Multiply-shift hash family: h(x) = (a * x + b) >> 32 with 64-bit wraparound
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        # Random odd multipliers that combine the rows of each band into a 64-bit bucket key
+        self.band_mix = rng.integers(1, 2 ** 63, size=(bands, self.rows), dtype=np.uint64) | np.uint64(1)
+        self.signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self.size = 0
+        self.buckets = {}
+        # Sorted copy of the bucket keys, so a batch can be screened with one searchsorted
+        self.sorted_keys = np.empty(0, dtype=np.uint64)
+        self.keys_stale = False
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.hits = 0
+
+    def __len__(self):
+        return self.size
+
+    def signatures_for(self, texts):
+        """
+        Return (signatures, valid): one MinHash signature row per text, and a
+        mask of the texts that had any words to shingle.
+        """
+        signatures = np.full((len(texts), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        valid = np.zeros(len(texts), dtype=bool)
+        for start in range(0, len(texts), SIGNATURE_BLOCK):
+            hashes = [shingle_hashes(text, self.shingle_size) for text in texts[start:start + SIGNATURE_BLOCK]]
+            lengths = np.array([len(h) for h in hashes])
+            rows = np.flatnonzero(lengths)
+            if not len(rows):
+                continue
+            values = np.fromiter((value for h in hashes for value in h), dtype=np.uint64, count=int(lengths.sum()))
+            # One row per hash function, so the minimum over each message's shingles is contiguous
+            permuted = ((self.a[:, None] * values + self.b[:, None]) >> np.uint64(32)).astype(np.uint32)
+            offsets = np.concatenate(([0], np.cumsum(lengths[rows])[:-1]))
+            signatures[start + rows] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            valid[start + rows] = True
+        return signatures, valid
+
+    def band_keys(self, signatures):
+        """Return the LSH bucket key of every band of every signature, shape (n, bands)."""
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        return (bands * self.band_mix).sum(axis=2, dtype=np.uint64)
+
+    def _screen(self, keys):
+        # Called with the lock held; mask of the signatures sharing at least one bucket
+        if self.keys_stale:
+            self.sorted_keys = np.sort(np.fromiter(self.buckets, dtype=np.uint64, count=len(self.buckets)))
+            self.keys_stale = False
+        if not len(self.sorted_keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.sorted_keys, keys), len(self.sorted_keys) - 1)
+        return (self.sorted_keys[positions] == keys).any(axis=1)
+
+    def _best_match(self, signature, keys):
+        # Called with the lock held; returns the highest similarity among the candidates
+        candidates = set()
+        for key in keys.tolist():
+            items = self.buckets.get(key)
+            if items:
+                candidates.update(items)
+        if not candidates:
+            return 0.0
+        items = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        return float((self.signatures[items] == signature).mean(axis=1).max())
+
+    def _insert(self, signature, keys):
+        # Called with the lock held
+        if self.size == len(self.signatures):
+            grown = np.empty((2 * len(self.signatures), self.num_perm), dtype=np.uint32)
+            grown[:self.size] = self.signatures[:self.size]
+            self.signatures = grown
+        item = self.size
+        self.signatures[item] = signature
+        self.size += 1
+        for key in keys.tolist():
+            self.buckets.setdefault(key, []).append(item)
+        self.keys_stale = True
+
+    def add(self, texts):
+        """
+        Add preprocessed spam messages. Messages without words, and messages
+        whose signature is already in the index, are skipped. Returns the
+        number of messages added.
+        """
+        signatures, valid = self.signatures_for(texts)
+        signatures = signatures[valid]
+        keys = self.band_keys(signatures)
+        added = 0
+        with self.lock:
+            for signature, signature_keys in zip(signatures, keys):
+                if self._best_match(signature, signature_keys) == 1.0:
+                    continue
+                self._insert(signature, signature_keys)
+                added += 1
+        return added
+
+    def match(self, texts):
+        """
+        Return, for each preprocessed message, the estimated similarity to
+        its closest known spam if it is at least threshold, otherwise None.
+        """
+        signatures, valid = self.signatures_for(texts)
+        keys = self.band_keys(signatures)
+        matches = [None] * len(texts)
+        with self.lock:
+            # Most messages share no bucket with known spam and are ruled out here
+            for row in np.flatnonzero(valid & self._screen(keys)):
+                similarity = self._best_match(signatures[row], keys[row])
+                if similarity >= self.threshold:
+                    matches[row] = similarity
+            self.queries += len(texts)
+            self.hits += sum(1 for similarity in matches if similarity is not None)
+        return matches
+
+    def predict(self, texts, predict_fn):
+        """
+        Return predictions for preprocessed texts: 1 for near-duplicates of
+        known spam, and predict_fn's result for the rest, which is called once.
+        """
+        with stage('near_duplicate', len(texts)):
+            matches = self.match(texts)
+        predictions = [1 if similarity is not None else None for similarity in matches]
+        missing = [index for index, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            for index, prediction in zip(missing, predict_fn([texts[index] for index in missing])):
+                predictions[index] = int(prediction)
+        return predictions
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': self.size,
+                'queries': self.queries,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.queries if self.queries else 0.0,
+                'memory_bytes': self.size * self.num_perm * 4,
+            }
+
+    def save(self, path=INDEX_PATH):
+        with self.lock:
+            signatures = self.signatures[:self.size].copy()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Write to a temporary file first so readers never see a partial index
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f,
+                     signatures=signatures,
+                     params=np.array([self.num_perm, self.bands, self.shingle_size, self.seed], dtype=np.int64),
+                     threshold=np.array(self.threshold))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            num_perm, bands, shingle_size, seed = (int(value) for value in data['params'])
+            index = cls(num_perm, bands, float(data['threshold']), shingle_size, seed)
+            signatures = data['signatures']
+        for signature, keys in zip(signatures, index.band_keys(signatures)):
+            index._insert(signature, keys)
+        return index
+
+def load_index(path=INDEX_PATH):
+    """Load the near-duplicate index. Returns None if it has not been built."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return NearDuplicateIndex.load(path)
+    except Exception as e:
+        print(f"Error loading near-duplicate index: {e}")
+        return None
+
+def build_index(messages, path=INDEX_PATH, **params):
+    """Build an index from preprocessed spam messages and save it."""
+    index = NearDuplicateIndex(**params)
+    index.add(list(messages))
+    index.save(path)
+    return index
+
+_reported_lock = threading.Lock()
+
+def load_reported(path=REPORTED_PATH):
+    """Return the spam reported in production, as raw messages, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with np.load(path) as data:
+        return data['messages'].tolist()
+
+def save_reported(messages, path=REPORTED_PATH):
+    """Add raw messages to the reported spam store. Returns the number that were new."""
+    with _reported_lock:
+        reported = load_reported(path)
+        known = set(reported)
+        new = [message for message in dict.fromkeys(messages) if message not in known]
+        if new:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                np.savez(f, messages=np.array(reported + new, dtype=str))
+            os.replace(temp_path, path)
+    return len(new)
+
+def with_reported(index, normalizer, path=REPORTED_PATH):
+    """
+    Add the reported spam, preprocessed with normalizer, to index and return
+    it. A new index is created if index is None and spam has been reported.
+    The index holds preprocessed messages, so nothing is added without a
+    normalizer.
+    """
+    messages = load_reported(path)
+    if not messages or normalizer is None:
+        return index
+    if index is None:
+        index = NearDuplicateIndex()
+    index.add(normalizer.transform(messages))
+    return index
+
+def read_messages(path):
+    """Read one message per line from a text file, or from stdin for '-'."""
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8', errors='replace')
+    try:
+        return [line.strip() for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build, extend or query the near-duplicate index of known spam.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Build the index from the spam messages in a dataset')
+    build_parser.add_argument('data', nargs='?', default='mail_data.csv', help='Dataset file (default: mail_data.csv)')
+    build_parser.add_argument('--threshold', type=float, default=0.7, help='Minimum estimated similarity for a match (default: 0.7)')
+    add_parser = subparsers.add_parser('add', help=f'Add confirmed spam, one message per line, to {REPORTED_PATH}')
+    add_parser.add_argument('input', help="Text file, or '-' to read from stdin")
+    query_parser = subparsers.add_parser('query', help='Check whether a message is a near-duplicate of known spam')
+    query_parser.add_argument('text', nargs='+', help='Email text to check')
+    parser.add_argument('--index', help=f"Index file (default: the current model version's for query, {INDEX_PATH} for build)")
+    args = parser.parse_args()
+
+    from model_store import current_file
+    if args.index is None:
+        args.index = current_file('spam_index.npz') if args.command == 'query' else INDEX_PATH
+
+    if args.command == 'build':
+        from spam_detector import load_preprocessed_corpus
+        df, _, _ = load_preprocessed_corpus(args.data)
+        spam = df.loc[df['spam'] == 1, 'message'].tolist()
+        index = build_index(spam, args.index, threshold=args.threshold)
+        print(f"Indexed {len(index)} distinct spam messages (of {len(spam)}) in {args.index}")
+        return
+
+    if args.command == 'add':
+        messages = read_messages(args.input)
+        added = save_reported(messages)
+        print(f"Added {added} of {len(messages)} messages to {REPORTED_PATH}; "
+              "they join the index of every model version when it is loaded")
+        return
+
+    from preprocessing import load_normalizer
+    normalizer = load_normalizer(current_file('preprocess.pkl'))
+    index = with_reported(load_index(args.index), normalizer)
+    if index is None:
+        print("Error: Near-duplicate index not found. Run 'python near_duplicate.py build' first.")
+        sys.exit(1)
+    else:
+        text = ' '.join(args.text)
+        if normalizer is not None:
+            text = normalizer.normalize(text)
+        similarity = index.match([text])[0]
+        if similarity is not None:
+            print(f"\n🚨 Near-duplicate of known spam (similarity {similarity:.2f}) 🚨\n")
+        else:
+            print("\nNo near-duplicate of known spam found\n")
+
+if __name__ == "__main__":
+    main()
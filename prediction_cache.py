@@ -0,0 +1,162 @@
+"""
+Bounded prediction cache for the Spam Email Detector project.
+
+Spam campaigns send the same body many times over. The cache sits between
+preprocessing and vectorization: it is keyed on a hash of the normalized text,
+so copies of a message that differ only in case or whitespace are scored once.
+Entries are evicted least-recently-used beyond max_entries and after an
+optional TTL, and the whole cache is dropped when the model files change.
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# The CURRENT pointer is replaced on every publish or rollback; the pickles cover unversioned models
+MODEL_FILES = ('spam_nlp/models/CURRENT', 'spam_nlp/cv.pkl', 'spam_nlp/svm.pkl', 'spam_nlp/preprocess.pkl')
+
+_WHITESPACE = re.compile(r'\s+')
+
+def cache_key(text):
+    """
+    Hash of text with case and whitespace normalized. CountVectorizer lowercases
+    and splits on non-word characters, so such copies always get the same features.
+    """
+    normalized = _WHITESPACE.sub(' ', text.lower()).strip()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
+def _model_signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of predictions.
+
+    max_entries bounds the number of cached messages, ttl (seconds, or None)
+    bounds their age, and model_files are checked at most every check_interval
+    seconds; when any of them changes, every entry is invalidated.
+    """
+
+    def __init__(self, max_entries=100000, ttl=None, model_files=MODEL_FILES, check_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.model_files = tuple(model_files)
+        self.check_interval = check_interval
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.signature = _model_signature(self.model_files)
+        self.next_check = time.monotonic() + check_interval
+
+    def _check_model_files(self, now):
+        # Called with the lock held
+        if now < self.next_check:
+            return
+        self.next_check = now + self.check_interval
+        signature = _model_signature(self.model_files)
+        if signature != self.signature:
+            self.signature = signature
+            self.entries.clear()
+            self.memory_bytes = 0
+            self.invalidations += 1
+
+    def _entry_size(self, key, entry):
+        return sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[0])
+
+    def get(self, key, now=None):
+        """Return the cached prediction for key, or None."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self._check_model_files(now)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] is not None and entry[1] <= now:
+                del self.entries[key]
+                self.memory_bytes -= self._entry_size(key, entry)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, prediction, now=None):
+        now = time.monotonic() if now is None else now
+        entry = (prediction, now + self.ttl if self.ttl is not None else None)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.memory_bytes -= self._entry_size(key, old)
+            self.entries[key] = entry
+            self.memory_bytes += self._entry_size(key, entry)
+            while len(self.entries) > self.max_entries:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self.memory_bytes -= self._entry_size(evicted_key, evicted)
+                self.evictions += 1
+
+    def predict(self, texts, predict_fn):
+        """
+        Return predictions for texts, calling predict_fn once with only the
+        texts that are not cached (duplicates within texts are scored once).
+        """
+        now = time.monotonic()
+        keys = [cache_key(text) for text in texts]
+        predictions = [self.get(key, now) for key in keys]
+
+        missing = {}
+        for index, prediction in enumerate(predictions):
+            if prediction is None:
+                missing.setdefault(keys[index], []).append(index)
+        if missing:
+            # Repeats within texts are scored once, so count them as hits
+            repeats = len(texts) - len(missing) - sum(prediction is not None for prediction in predictions)
+            with self.lock:
+                self.hits += repeats
+                self.misses -= repeats
+            first = [indexes[0] for indexes in missing.values()]
+            for key, prediction in zip(missing, predict_fn([texts[index] for index in first])):
+                prediction = int(prediction)
+                self.put(key, prediction, now)
+                for index in missing[key]:
+                    predictions[index] = prediction
+        return predictions
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.memory_bytes = 0
+
+    def stats(self):
+        """Hit rate, eviction and memory counters."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'memory_bytes': self.memory_bytes,
+            }
@@ -0,0 +1,72 @@
+"""
+Serve-time text preprocessing for the Spam Email Detector project.
+
+Training (spam_detector.preprocess_data) lowercases, strips special
+characters, lemmatizes with WordNet and drops the most frequent and
+single-occurrence words. The lemma table and dropped-word sets it builds are
+saved next to the model so that inference can apply the same normalization
+with plain dictionary and set lookups, without loading NLTK or WordNet.
+"""
+
+import os
+import re
+import pickle
+
+# Characters kept by the cleaning step; everything else becomes a space
+CLEAN_PATTERN = re.compile("[^'.,a-z0-9 ]+")
+
+NORMALIZER_PATH = 'spam_nlp/preprocess.pkl'
+
+class TextNormalizer:
+    """Applies the training-time preprocessing to new messages."""
+
+    def __init__(self, lemmas, most_freq_words, least_freq_words, pattern=CLEAN_PATTERN.pattern):
+        self.lemmas = dict(lemmas)
+        self.most_freq_words = frozenset(most_freq_words)
+        self.least_freq_words = frozenset(least_freq_words)
+        self.dropped_words = self.most_freq_words | self.least_freq_words
+        self.pattern = re.compile(pattern)
+
+    def normalize(self, text):
+        """Normalize a single message the same way the training data was."""
+        lemmas = self.lemmas
+        dropped_words = self.dropped_words
+        words = (lemmas.get(token, token) for token in self.pattern.sub(' ', text.lower()).split())
+        return ' '.join([word for word in words if word not in dropped_words])
+
+    def transform(self, texts):
+        """Normalize a sequence of messages."""
+        return [self.normalize(text) for text in texts]
+
+    def to_dict(self):
+        return {
+            'pattern': self.pattern.pattern,
+            'lemmas': self.lemmas,
+            'most_freq_words': self.most_freq_words,
+            'least_freq_words': self.least_freq_words,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['lemmas'], data['most_freq_words'], data['least_freq_words'], data['pattern'])
+
+def save_normalizer(normalizer, path=NORMALIZER_PATH):
+    """Save the preprocessing artifact as plain Python types."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(normalizer.to_dict(), f)
+
+def load_normalizer(path=NORMALIZER_PATH):
+    """
+    Load the preprocessing artifact. Returns None if it does not exist, which
+    is the case for models trained before it was introduced; those models are
+    scored on the raw text as before.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return TextNormalizer.from_dict(pickle.load(f))
+    except Exception as e:
+        print(f"Error loading preprocessing artifact: {e}")
+        return None
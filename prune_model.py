@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Model compression for the Spam Email Detector project.
+
+train_model fits CountVectorizer() with its defaults, so every word seen at
+least once is kept and cv.pkl grows with the corpus. This script retrains at
+several pruning levels and reports what each one costs and saves:
+  - min_df / max_features prune rare words while fitting the vocabulary
+  - keep prunes by weight: after a first fit, only the features with the
+    largest |coef_| are kept and the LinearSVC is retrained on that vocabulary
+Counts are int32 and the SVM weights float32 at every level.
+
+For each level it prints the number of features, the size of cv.pkl and
+svm.pkl, the time and memory taken to load them, and the accuracy on the same
+held out split as train_model, plus the agreement with the uncompressed model.
+
+Usage:
+    python prune_model.py
+    python prune_model.py --min-df 1 2 5 --keep 0 2000 1000 500
+    python prune_model.py --save --tolerance 0.01
+"""
+
+import os
+import sys
+import time
+import pickle
+import argparse
+import tempfile
+import tracemalloc
+from itertools import product
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.svm import LinearSVC
+from spam_detector import load_preprocessed_corpus, save_model
+from near_duplicate import load_index
+
+def compact(cv, svm):
+    """
+    Shrink a fitted model for pickling: drop the set of pruned words that
+    older scikit-learn versions keep on the vectorizer as stop_words_, and
+    store the SVM weights as float32.
+    """
+    if hasattr(cv, 'stop_words_'):
+        del cv.stop_words_
+    svm.coef_ = svm.coef_.astype(np.float32)
+    svm.intercept_ = svm.intercept_.astype(np.float32)
+    return cv, svm
+
+def fit_pruned(x_train, y_train, min_df=1, max_features=None, keep=None):
+    """
+    Fit an int32 CountVectorizer with min_df/max_features and a LinearSVC. With
+    keep, only the keep features with the largest |coef_| are kept and the
+    model is retrained on that vocabulary. Returns the compacted (cv, svm).
+    """
+    cv = CountVectorizer(min_df=min_df, max_features=max_features, dtype=np.int32)
+    x = cv.fit_transform(x_train)
+    svm = LinearSVC().fit(x, y_train)
+
+    if keep and keep < len(cv.vocabulary_):
+        # Stable sort, so ties between equal weights are broken the same way every run
+        kept = np.sort(np.argsort(-np.abs(svm.coef_).ravel(), kind='stable')[:keep])
+        # Renumber the vocabulary in place, as retrain.extend_vocabulary does, and keep the matching columns
+        cv.vocabulary_ = {term: index for index, term in enumerate(cv.get_feature_names_out()[kept])}
+        svm = LinearSVC().fit(x[:, kept], y_train)
+    return compact(cv, svm)
+
+def measure_artifacts(cv, svm, repeats=3):
+    """
+    Pickle the model to a temporary directory and return its size in bytes,
+    the best load time in seconds out of repeats, and the memory the loaded
+    objects hold in bytes.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, 'cv.pkl'), os.path.join(tmp, 'svm.pkl')]
+        for path, model in zip(paths, (cv, svm)):
+            with open(path, 'wb') as f:
+                pickle.dump(model, f)
+        size = sum(os.path.getsize(path) for path in paths)
+
+        def load():
+            loaded = []
+            for path in paths:
+                with open(path, 'rb') as f:
+                    loaded.append(pickle.load(f))
+            return loaded
+
+        load_seconds = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            load()
+            load_seconds = min(load_seconds, time.perf_counter() - start)
+
+        tracemalloc.start()
+        loaded = load()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del loaded
+    return size, load_seconds, memory
+
+def evaluate_level(name, cv, svm, x_test, y_test, reference):
+    """Return the report row for one pruning level."""
+    size, load_seconds, memory = measure_artifacts(cv, svm)
+    y_pred = svm.predict(cv.transform(x_test))
+    return {
+        'level': name,
+        'features': len(cv.vocabulary_),
+        'size_kb': size / 1024,
+        'load_ms': load_seconds * 1000,
+        'memory_kb': memory / 1024,
+        'accuracy': float((y_pred == y_test).mean()),
+        'agreement': float((y_pred == reference).mean()),
+        'model': (cv, svm),
+    }
+
+def print_report(rows):
+    print(f"\n{'level':<28} {'features':>8} {'size (KB)':>10} {'load (ms)':>10} {'memory (KB)':>12} "
+          f"{'accuracy':>9} {'agreement':>10}")
+    for row in rows:
+        print(f"{row['level']:<28} {row['features']:>8} {row['size_kb']:>10.1f} {row['load_ms']:>10.2f} "
+              f"{row['memory_kb']:>12.1f} {row['accuracy']:>9.4f} {row['agreement']:>10.2%}")
+
+def prune_model(file_path, min_dfs, max_features_list, keeps, save=False, tolerance=0.002):
+    """
+    Train the uncompressed model and one compressed model per combination of
+    min_df, max_features and keep, print the report and return its rows, or
+    None on failure. With save, the smallest model whose accuracy is within
+    tolerance of the uncompressed one replaces the saved model.
+    """
+    try:
+        df, normalizer, term_frequency = load_preprocessed_corpus(file_path)
+        x = df['message']
+        y = df['spam'].to_numpy()
+        x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.3, random_state=42)
+
+        # The model as train_model builds it, for reference
+        cv = CountVectorizer()
+        svm = LinearSVC().fit(cv.fit_transform(x_train), y_train)
+        reference = svm.predict(cv.transform(x_test))
+        rows = [evaluate_level('original (int64/float64)', cv, svm, x_test, y_test, reference)]
+
+        for min_df, max_features, keep in product(min_dfs, max_features_list, keeps):
+            name = f"min_df={min_df}"
+            if max_features:
+                name += f" max={max_features}"
+            if keep:
+                name += f" keep={keep}"
+            cv, svm = fit_pruned(x_train, y_train, min_df, max_features or None, keep or None)
+            rows.append(evaluate_level(name, cv, svm, x_test, y_test, reference))
+        print_report(rows)
+
+        if save:
+            baseline = rows[0]['accuracy']
+            candidates = [row for row in rows[1:] if row['accuracy'] >= baseline - tolerance]
+            if not candidates:
+                print(f"\nNo pruning level is within {tolerance:.2%} of the original accuracy; model not saved.")
+            else:
+                best = min(candidates, key=lambda row: row['size_kb'])
+                print(f"\nSaving {best['level']}: {best['size_kb']:.1f} KB "
+                      f"({best['size_kb'] / rows[0]['size_kb']:.0%} of the original), accuracy {best['accuracy']:.4f}")
+                # The near-duplicate index carries over; the cascade was calibrated against the unpruned model
+                save_model(*best['model'], normalizer, term_frequency,
+                           {'accuracy': best['accuracy'], 'agreement': best['agreement'], 'pruning': best['level']},
+                           index=load_index())
+
+        for row in rows:
+            del row['model']
+        return rows
+
+    except Exception as e:
+        print(f"Error pruning model: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Report size, load time, memory and accuracy of pruned spam models.')
+    parser.add_argument('data', nargs='?', default='mail_data.csv', help='Dataset file (default: mail_data.csv)')
+    parser.add_argument('--min-df', type=int, nargs='+', default=[1, 2], help='CountVectorizer min_df values (default: 1 2)')
+    parser.add_argument('--max-features', type=int, nargs='+', default=[0], help='CountVectorizer max_features values, 0 for no limit (default: 0)')
+    parser.add_argument('--keep', type=int, nargs='+', default=[0, 2000, 1000, 500, 250],
+                        help='Features kept by |coef_| after the first fit, 0 to keep all (default: 0 2000 1000 500 250)')
+    parser.add_argument('--save', action='store_true', help='Save the smallest model within --tolerance of the original accuracy')
+    parser.add_argument('--tolerance', type=float, default=0.002, help='Accuracy loss allowed by --save (default: 0.002)')
+    args = parser.parse_args()
+
+    rows = prune_model(args.data, args.min_df, args.max_features, args.keep, args.save, args.tolerance)
+    if rows is None:
+        print("Failed to prune model.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
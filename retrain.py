@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Incremental retraining for the Spam Email Detector project.
+Updates the saved model with newly labeled messages without a full re-fit:
+the running term frequencies, dropped-word sets and vocabulary are updated
+from the new messages only, and the classifier is warm-started from the
+previous weights. The cost scales with the number of new messages, not the
+size of the corpus.
+
+Usage:
+    python retrain.py new_labels.csv
+"""
+
+import os
+import sys
+import csv
+import argparse
+from itertools import chain
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+import numpy as np
+from spam_detector import read_data_file, load_model_version
+from preprocessing import CLEAN_PATTERN, TextNormalizer
+from term_stats import TermCounts, load_term_counts, most_frequent_words, TOP_WORDS_DROPPED, MAX_RARE_COUNT
+from model_store import publish_model
+
+def lemmatize_messages(messages, lemmas):
+    """
+    Clean and lemmatize messages, looking up known tokens in the saved lemma
+    table and lemmatizing only tokens that have never been seen (added to lemmas).
+    """
+    token_lists = messages.str.lower().str.replace(CLEAN_PATTERN, " ", regex=True).str.split().tolist()
+    unseen = set(chain.from_iterable(token_lists)) - lemmas.keys()
+    if unseen:
+        from nltk.stem import WordNetLemmatizer
+        lem = WordNetLemmatizer()
+        lemmas.update({token: lem.lemmatize(token, pos='v') for token in unseen})
+    return [[lemmas[token] for token in tokens] for tokens in token_lists]
+
+def extend_vocabulary(cv, svm, words):
+    """
+    Append words missing from the vectorizer vocabulary, giving them new column
+    indices and zero weights. Returns the widened coefficient and intercept arrays.
+    """
+    vocabulary = dict(cv.vocabulary_)
+    for word in sorted(words):
+        if word not in vocabulary:
+            vocabulary[word] = len(vocabulary)
+    coef = np.zeros((1, len(vocabulary)))
+    coef[:, :svm.coef_.shape[1]] = svm.coef_
+    cv.vocabulary_ = vocabulary
+    return coef, np.asarray(svm.intercept_, dtype=np.float64)
+
+def update_model(new_data_file, data_file='mail_data.csv', append=True, epochs=5, eta0=0.01):
+    """
+    Update the saved model, preprocessing artifact and term statistics with the
+    labeled messages in new_data_file. Returns True on success.
+    """
+    from sklearn.linear_model import SGDClassifier
+
+    try:
+        version = load_model_version()
+        term_counts = load_term_counts()
+        if version is None or version.normalizer is None or not isinstance(term_counts, TermCounts):
+            print("Error: Incremental updates need a model trained by spam_detector.py with its preprocessing "
+                  "artifact and term statistics. Please retrain the model first.")
+            return False
+        cv, svm, normalizer, index = version.cv, version.svm, version.normalizer, version.index
+        if not hasattr(cv, 'vocabulary_'):
+            print("Error: Incremental updates need a CountVectorizer vocabulary (hashing models are not supported).")
+            return False
+
+        delta = read_data_file(new_data_file)
+        if 'Category' in delta.columns and 'Message' in delta.columns:
+            delta = delta.rename(columns={'Category': 'spam', 'Message': 'message'})
+        delta = delta.dropna(subset=['message'])
+        print(f"Updating model with {len(delta)} new messages...")
+        labels = (delta['spam'] == 'spam').astype(int).to_numpy()
+
+        # Update the running term frequencies and the dropped-word sets
+        lemmas = dict(normalizer.lemmas)
+        token_lists = lemmatize_messages(delta['message'], lemmas)
+        term_counts.update(token_lists)
+        most_freq_words = most_frequent_words(term_counts, TOP_WORDS_DROPPED)
+        least_freq_words = frozenset(term_counts.rare(MAX_RARE_COUNT))
+        normalizer = TextNormalizer(lemmas, most_freq_words, least_freq_words)
+        texts = [' '.join([word for word in tokens if word not in normalizer.dropped_words]) for tokens in token_lists]
+
+        # Grow the vocabulary with words that now survive the filters
+        old_features = len(cv.vocabulary_)
+        coef, intercept = extend_vocabulary(cv, svm, set(chain.from_iterable(text.split() for text in texts)))
+        x_delta = cv.transform(texts)
+        accuracy_before = float((svm.predict(x_delta[:, :old_features]) == labels).mean())
+
+        # Warm-start a hinge-loss SGD model from the previous weights and train on the new messages only.
+        # partial_fit with both classes declared accepts a delta of one class, typically spam only.
+        n_messages = term_counts.documents
+        updated = SGDClassifier(loss='hinge', alpha=1.0 / n_messages, learning_rate='constant', eta0=eta0,
+                                random_state=42)
+        updated.coef_, updated.intercept_ = coef, intercept
+        for _ in range(epochs):
+            updated.partial_fit(x_delta, labels, classes=np.array([0, 1]))
+        accuracy_after = float((updated.predict(x_delta) == labels).mean())
+
+        print(f"Vocabulary: {old_features} -> {len(cv.vocabulary_)} features")
+        print(f"Accuracy on new messages: {accuracy_before:.4f} before, {accuracy_after:.4f} after update")
+
+        # Newly confirmed spam joins the near-duplicate index, so its variants skip the model
+        if index is not None:
+            added = index.add([text for text, label in zip(texts, labels) if label == 1])
+            print(f"Added {added} spam messages to the near-duplicate index")
+
+        # Publish model, vectorizer, preprocessing state and index as a new version, and save the term statistics.
+        # The cascade was calibrated against the previous weights, so the new version has none.
+        publish_model(cv, updated, normalizer, {'new_messages': len(delta), 'new_message_accuracy_before': accuracy_before,
+                                                'new_message_accuracy_after': accuracy_after}, n_messages, index=index)
+        term_counts.save()
+
+        # Keep the dataset complete so that a later full retrain includes the new messages
+        if append:
+            with open(data_file, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                for label, message in zip(delta['spam'], delta['message']):
+                    writer.writerow([label, message])
+            print(f"Appended {len(delta)} messages to {data_file}")
+
+        print("Model updated successfully.")
+        return True
+
+    except Exception as e:
+        print(f"Error updating model: {e}")
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the spam model with newly labeled messages.')
+    parser.add_argument('new_data', help='Category,Message CSV file with the newly labeled messages')
+    parser.add_argument('--data', default='mail_data.csv', help='Dataset to append the new messages to (default: mail_data.csv)')
+    parser.add_argument('--no-append', action='store_true', help='Do not append the new messages to the dataset')
+    parser.add_argument('--epochs', type=int, default=5, help='Passes over the new messages (default: 5)')
+    parser.add_argument('--eta0', type=float, default=0.01, help='SGD learning rate (default: 0.01)')
+    args = parser.parse_args()
+
+    if not update_model(args.new_data, args.data, not args.no_append, args.epochs, args.eta0):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
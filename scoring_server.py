@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Resident scoring server for the Spam Email Detector project.
+Loads the vectorizer and model once and serves predictions over HTTP.
+Requests that arrive at the same time are micro-batched into a single
+transform/predict call. Repeated messages are answered from a prediction
+cache, and near-duplicates of known spam from the near-duplicate index.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+from test_model import load_model_version
+from prediction_cache import PredictionCache
+from near_duplicate import save_reported
+from fused_scorer import load_fused_scorer
+from instrumentation import stage, configure, is_enabled, render_prometheus
+
+class MicroBatcher:
+    """
+    Collects messages submitted from many threads and scores them together.
+
+    A single worker thread takes the first pending request, waits up to
+    max_delay seconds for more to arrive (or until max_batch messages are
+    queued), and then runs one transform/predict call for all of them.
+    With a PredictionCache, only messages not seen before reach the model,
+    with a NearDuplicateIndex, neither do variants of known spam, and with a
+    CascadeClassifier, neither do messages its first stage is confident about.
+    With a model_store.ModelWatcher, a newly published model version is
+    swapped in between batches, together with its index and cascade;
+    use_index and use_cascade (by default, whether one was given) decide
+    whether those of later versions are used.
+    """
+
+    def __init__(self, cv, svm, max_batch=256, max_delay=0.002, normalizer=None, cache=None, index=None, cascade=None,
+                 watcher=None, use_index=None, use_cascade=None):
+        self.cv = cv
+        self.svm = svm
+        self.normalizer = normalizer
+        self.cache = cache
+        self.index = index
+        self.cascade = cascade
+        self.use_index = index is not None if use_index is None else use_index
+        self.use_cascade = cascade is not None if use_cascade is None else use_cascade
+        self.watcher = watcher
+        self.version = watcher.current if watcher is not None else None
+        # Tokenize and sum the weights in one pass instead of building a sparse matrix per batch
+        self.fused = load_fused_scorer(cv, svm)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = queue.Queue()
+        self.batches = 0
+        self.messages = 0
+        self.worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, messages):
+        """Queue a list of messages and return a Future resolving to their labels."""
+        future = Future()
+        self.pending.put((list(messages), future))
+        return future
+
+    def score(self, messages, timeout=None):
+        """Score a list of messages, blocking until the batch containing them is done."""
+        return self.submit(messages).result(timeout)
+
+    def _run(self):
+        while True:
+            requests = [self.pending.get()]
+            count = len(requests[0][0])
+            deadline = time.perf_counter() + self.max_delay
+            while count < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                count += len(request[0])
+            if self.watcher is not None:
+                self._sync_model()
+            self._score(requests)
+
+    def _sync_model(self):
+        # Runs on the worker thread between batches, so each batch is scored by a single version.
+        # The watcher has already loaded it; queued requests just wait for the next batch.
+        version = self.watcher.current
+        if version is self.version:
+            return
+        self.version = version
+        self.cv = version.cv
+        self.svm = version.svm
+        self.normalizer = version.normalizer
+        self.fused = load_fused_scorer(self.cv, self.svm)
+        # The index holds preprocessed messages, so it needs the preprocessing artifact
+        self.index = version.index if self.use_index and self.normalizer is not None else None
+        self.cascade = version.cascade if self.use_cascade else None
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _score(self, requests):
+        texts = [text for messages, _ in requests for text in messages]
+        if not texts:
+            for _, future in requests:
+                future.set_result([])
+            return
+        try:
+            if self.normalizer is not None:
+                with stage('normalize', len(texts)):
+                    texts = self.normalizer.transform(texts)
+            if self.cache is not None:
+                predictions = self.cache.predict(texts, self._predict_uncached)
+            else:
+                predictions = self._predict_uncached(texts)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        labels = ['spam' if prediction == 1 else 'ham' for prediction in predictions]
+        self.batches += 1
+        self.messages += len(texts)
+        start = 0
+        for messages, future in requests:
+            future.set_result(labels[start:start + len(messages)])
+            start += len(messages)
+
+    def report_spam(self, messages):
+        """
+        Add confirmed spam to the near-duplicate index, and save it to the
+        reported spam store, which every model version loaded later merges in.
+        Returns the number added to the index.
+        """
+        save_reported(messages)
+        normalizer, index = self.normalizer, self.index
+        if self.watcher is not None and self.use_index:
+            # The newest loaded version, even if no batch has been scored since it was published,
+            # so the report reaches the index that scores the next batch
+            version = self.watcher.current
+            normalizer, index = version.normalizer, version.index
+        if index is None or normalizer is None:
+            return 0
+        return index.add(normalizer.transform(messages))
+
+    def _predict_uncached(self, texts):
+        if self.index is not None:
+            return self.index.predict(texts, self._predict_cascade)
+        return self._predict_cascade(texts)
+
+    def _predict_cascade(self, texts):
+        if self.cascade is not None:
+            return self.cascade.predict(texts, self._predict)
+        return self._predict(texts)
+
+    def _predict(self, texts):
+        if self.fused is not None:
+            return self.fused.predict(texts)
+        with stage('vectorize', len(texts)):
+            features = self.cv.transform(texts)
+        with stage('predict', len(texts)):
+            return self.svm.predict(features)
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """
+    HTTP endpoints:
+      GET  /health       - server status, batching and cache counters
+      GET  /metrics      - per-stage metrics in Prometheus text format (with --metrics)
+      POST /score        - {"message": "..."} -> {"prediction": "spam"|"ham"}
+      POST /score/batch  - {"messages": [...]} -> {"predictions": [...]}
+      POST /report/spam  - {"messages": [...]} -> {"added": n}, confirmed spam for the near-duplicate index
+      POST /model/rollback - switch back to the previous model version (with a model store)
+    """
+
+    batcher = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            data = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if self.path != '/health':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        health = {
+            'status': 'ok',
+            'batches': self.batcher.batches,
+            'messages': self.batcher.messages,
+        }
+        if self.batcher.cache is not None:
+            health['cache'] = self.batcher.cache.stats()
+        if self.batcher.index is not None:
+            health['near_duplicate_index'] = self.batcher.index.stats()
+        if self.batcher.cascade is not None:
+            health['cascade'] = self.batcher.cascade.stats()
+        if self.batcher.watcher is not None:
+            health['model'] = self.batcher.watcher.stats()
+        self.send_json(200, health)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': 'Request body must be valid JSON'})
+            return
+        if not isinstance(payload, dict):
+            self.send_json(400, {'error': 'Request body must be a JSON object'})
+            return
+
+        if self.path == '/score':
+            message = payload.get('message')
+            if not isinstance(message, str):
+                self.send_json(400, {'error': "Expected a 'message' string"})
+                return
+            self.send_json(200, {'prediction': self.batcher.score([message])[0]})
+        elif self.path == '/score/batch':
+            messages = payload.get('messages')
+            if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+                self.send_json(400, {'error': "Expected a 'messages' list of strings"})
+                return
+            self.send_json(200, {'predictions': self.batcher.score(messages)})
+        elif self.path == '/report/spam':
+            messages = payload.get('messages')
+            if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+                self.send_json(400, {'error': "Expected a 'messages' list of strings"})
+                return
+            if self.batcher.index is None:
+                self.send_json(409, {'error': 'The near-duplicate index is disabled'})
+                return
+            self.send_json(200, {'added': self.batcher.report_spam(messages)})
+        elif self.path == '/model/rollback':
+            if self.batcher.watcher is None:
+                self.send_json(409, {'error': 'Model reloading is disabled'})
+                return
+            try:
+                self.send_json(200, {'version': self.batcher.watcher.rollback()})
+            except ValueError as e:
+                self.send_json(409, {'error': str(e)})
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the cost of scoring
+        pass
+
+def load_watcher(interval):
+    """
+    Start a ModelWatcher on the model store, or return None if reloading is
+    disabled (interval 0) or no version has been published yet.
+    """
+    if interval <= 0:
+        return None
+    from model_store import ModelWatcher, current_version_name
+    if current_version_name() is None:
+        print("No published model version; serving spam_nlp/cv.pkl and svm.pkl without reloading")
+        return None
+    try:
+        return ModelWatcher(interval=interval).start()
+    except Exception as e:
+        print(f"Error loading the published model version, serving without reloading: {e}")
+        return None
+
+class ScoringServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for bursts of clients."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+def create_server(host, port, cv, svm, max_batch=256, max_delay=0.002, normalizer=None, cache=None, index=None,
+                  cascade=None, watcher=None, use_index=None, use_cascade=None):
+    """Create a scoring HTTP server around an already loaded vectorizer and model."""
+    handler = type('BoundScoringHandler', (ScoringHandler,), {
+        'batcher': MicroBatcher(cv, svm, max_batch, max_delay, normalizer, cache, index, cascade, watcher,
+                                use_index, use_cascade)
+    })
+    return ScoringServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the resident spam scoring server.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+    parser.add_argument('--max-batch', type=int, default=256, help='Maximum messages per micro-batch (default: 256)')
+    parser.add_argument('--max-delay-ms', type=float, default=2.0, help='Maximum time to wait while filling a micro-batch (default: 2ms)')
+    parser.add_argument('--cache-size', type=int, default=100000, help='Distinct messages kept in the prediction cache, 0 to disable (default: 100000)')
+    parser.add_argument('--cache-ttl', type=float, help='Seconds a cached prediction stays valid (default: until evicted or the model changes)')
+    parser.add_argument('--no-near-duplicates', action='store_true', help='Score every message with the model, ignoring the near-duplicate index')
+    parser.add_argument('--no-cascade', action='store_true', help='Score every message with the full model, skipping the early-exit cascade')
+    parser.add_argument('--metrics', action='store_true', help='Record per-stage metrics and serve them at /metrics')
+    parser.add_argument('--reload-interval', type=float, default=2.0,
+                        help='Seconds between checks for a newly published model version, 0 to disable (default: 2)')
+    args = parser.parse_args()
+    
+    if args.metrics and not is_enabled():
+        configure()
+
+    watcher = load_watcher(args.reload_interval)
+    version = watcher.current if watcher is not None else load_model_version()
+    if version is None:
+        print("Error: Model files not found. Please run spam_detector.py first to train the model.")
+        sys.exit(1)
+    cv, svm, normalizer, index, cascade = version.cv, version.svm, version.normalizer, version.index, version.cascade
+
+    cache = PredictionCache(args.cache_size, args.cache_ttl) if args.cache_size > 0 else None
+    # The index holds preprocessed messages, so it needs the preprocessing artifact
+    use_index, use_cascade = not args.no_near_duplicates, not args.no_cascade
+    index = index if use_index and normalizer is not None else None
+    cascade = cascade if use_cascade else None
+    server = create_server(args.host, args.port, cv, svm, args.max_batch, args.max_delay_ms / 1000.0, normalizer,
+                           cache, index, cascade, watcher, use_index, use_cascade)
+    print(f"Scoring server listening on http://{args.host}:{args.port}")
+    if watcher is not None:
+        print(f"Serving model version {watcher.current.name}, checking for new versions every {args.reload_interval:g}s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down scoring server...")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+SMTP front-end for the Spam Email Detector project.
+
+An asyncio SMTP receiver that scores every message inline, at delivery time.
+Message bodies are parsed in a thread pool and scored by the same
+micro-batching scorer as the HTTP server, so the event loop keeps serving
+other connections while the model runs. Each message is then tagged with
+X-Spam-Flag and X-Spam-Verdict headers, or rejected with a 550 reply if it is
+spam, and accepted messages are relayed to an upstream SMTP server or written
+to a Maildir.
+
+Backpressure: connections beyond --max-connections are turned away with a 421
+reply, and when --max-pending messages are already waiting for a verdict, new
+messages get a 451 (try again later) reply so that the sender retries.
+
+Usage:
+    python smtp_server.py --port 2525 --action tag --relay localhost:25
+    python smtp_server.py --port 2525 --action reject --maildir delivered
+"""
+
+import os
+import re
+import sys
+import time
+import socket
+import asyncio
+import smtplib
+import argparse
+import mailbox
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+from test_model import load_model_version
+from prediction_cache import PredictionCache
+from scoring_server import MicroBatcher, load_watcher
+from mail_ingest import message_text
+from instrumentation import record
+
+# Longest line accepted by the stream reader; longer lines close the connection
+LINE_LIMIT = 1024 * 1024
+MAX_RECIPIENTS = 100
+
+MAIL_PATTERN = re.compile(r'FROM:\s*<([^>]*)>(.*)', re.IGNORECASE)
+RCPT_PATTERN = re.compile(r'TO:\s*<([^>]*)>', re.IGNORECASE)
+SIZE_PATTERN = re.compile(r'\bSIZE=(\d+)', re.IGNORECASE)
+
+def tag_message(data, verdict):
+    """Prepend the verdict headers to a raw message."""
+    flag = 'YES' if verdict == 'spam' else 'NO'
+    return f'X-Spam-Flag: {flag}\r\nX-Spam-Verdict: {verdict}\r\n'.encode('ascii') + data
+
+def percentiles(values):
+    """p50/p95/p99 of a sequence of seconds, in milliseconds."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {f'p{p}_ms': ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000 for p in (50, 95, 99)}
+
+class SMTPStats:
+    """Counters and recent latencies of the SMTP front-end."""
+
+    def __init__(self, window=10000):
+        self.connections = 0
+        self.active = 0
+        self.refused = 0
+        self.deferred = 0
+        self.messages = 0
+        self.spam = 0
+        self.rejected = 0
+        self.delivery_errors = 0
+        # Time from the end of DATA to the verdict, per message
+        self.score_latency = deque(maxlen=window)
+        # Mean scoring latency and total duration of each closed connection
+        self.connection_latency = deque(maxlen=window)
+        self.connection_duration = deque(maxlen=window)
+
+    def snapshot(self):
+        return {
+            'connections': self.connections,
+            'active': self.active,
+            'refused': self.refused,
+            'deferred': self.deferred,
+            'messages': self.messages,
+            'spam': self.spam,
+            'rejected': self.rejected,
+            'delivery_errors': self.delivery_errors,
+            'score_latency': percentiles(self.score_latency),
+            'connection_latency': percentiles(self.connection_latency),
+            'connection_duration': percentiles(self.connection_duration),
+        }
+
+class SMTPFrontend:
+    """
+    Accepts SMTP connections, scores each message and delivers or rejects it.
+
+    action is 'tag' (deliver everything with verdict headers) or 'reject'
+    (refuse spam with a 550 reply). Accepted messages go to relay, a
+    (host, port) pair, or to the Maildir at maildir; with neither they are
+    only scored.
+    """
+
+    def __init__(self, batcher, hostname=None, action='tag', relay=None, maildir=None, max_connections=100,
+                 max_pending=1000, max_size=10 * 1024 * 1024, timeout=300.0, queue_timeout=5.0, workers=4):
+        self.batcher = batcher
+        self.hostname = hostname or socket.gethostname()
+        self.action = action
+        self.relay = relay
+        self.maildir = mailbox.Maildir(maildir, create=True) if maildir else None
+        self.maildir_lock = threading.Lock()
+        self.max_connections = max_connections
+        self.max_size = max_size
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.pending = asyncio.Semaphore(max_pending)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='smtp-worker')
+        self.stats = SMTPStats()
+
+    async def handle(self, reader, writer):
+        """Serve one SMTP connection."""
+        self.stats.connections += 1
+        if self.stats.active >= self.max_connections:
+            self.stats.refused += 1
+            writer.write(b'421 4.3.2 Too many connections, try again later\r\n')
+            await self.close(writer)
+            return
+
+        self.stats.active += 1
+        session = SMTPSession(self, reader, writer)
+        start = time.perf_counter()
+        try:
+            await session.run()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            duration = time.perf_counter() - start
+            self.stats.active -= 1
+            self.stats.connection_duration.append(duration)
+            if session.latencies:
+                self.stats.connection_latency.append(sum(session.latencies) / len(session.latencies))
+            record('smtp_connection', duration, len(session.latencies))
+            await self.close(writer)
+
+    async def close(self, writer):
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def process(self, mail_from, recipients, data):
+        """Score one message and deliver or reject it. Returns (latency, reply)."""
+        if not self.pending.locked():
+            await self.pending.acquire()
+        else:
+            try:
+                await asyncio.wait_for(self.pending.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats.deferred += 1
+                return None, '451 4.3.2 Too many messages waiting to be scored, try again later'
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            # Parsing and scoring run off the event loop
+            text = await loop.run_in_executor(self.executor, message_text, data)
+            verdict = (await asyncio.wrap_future(self.batcher.submit([text])))[0]
+        except Exception as e:
+            print(f"Error scoring message: {e}", file=sys.stderr)
+            return None, '451 4.3.0 Error scoring message, try again later'
+        finally:
+            self.pending.release()
+        latency = time.perf_counter() - start
+        record('smtp_score', latency, 1)
+        self.stats.score_latency.append(latency)
+        self.stats.messages += 1
+
+        if verdict == 'spam':
+            self.stats.spam += 1
+            if self.action == 'reject':
+                self.stats.rejected += 1
+                return latency, '550 5.7.1 Message rejected as spam'
+        try:
+            await loop.run_in_executor(self.executor, self.deliver, mail_from, recipients, tag_message(data, verdict))
+        except Exception as e:
+            self.stats.delivery_errors += 1
+            print(f"Error delivering message: {e}", file=sys.stderr)
+            return latency, '451 4.4.0 Delivery failed, try again later'
+        return latency, f'250 2.0.0 OK: message accepted as {verdict}'
+
+    def deliver(self, mail_from, recipients, data):
+        if self.relay is not None:
+            with smtplib.SMTP(*self.relay, timeout=30) as client:
+                client.sendmail(mail_from, recipients, data)
+        elif self.maildir is not None:
+            with self.maildir_lock:
+                self.maildir.add(data)
+
+class SMTPSession:
+    """State of one SMTP connection: the greeting, the envelope and the message data."""
+
+    def __init__(self, frontend, reader, writer):
+        self.frontend = frontend
+        self.reader = reader
+        self.writer = writer
+        self.greeted = False
+        self.latencies = []
+        self.reset()
+
+    def reset(self):
+        self.mail_from = None
+        self.recipients = []
+
+    async def reply(self, line):
+        self.writer.write(line.encode('utf-8') + b'\r\n')
+        await self.writer.drain()
+
+    async def readline(self):
+        line = await asyncio.wait_for(self.reader.readline(), self.frontend.timeout)
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+        return line
+
+    async def run(self):
+        await self.reply(f'220 {self.frontend.hostname} ESMTP Spam Email Detector')
+        try:
+            while True:
+                line = (await self.readline()).rstrip(b'\r\n').decode('utf-8', errors='replace')
+                command, _, argument = line.partition(' ')
+                handler = getattr(self, f'smtp_{command.upper()}', None)
+                if handler is None:
+                    await self.reply('500 5.5.2 Command not recognized')
+                elif await handler(argument.strip()) is False:
+                    return
+        except asyncio.TimeoutError:
+            await self.reply('421 4.4.2 Timeout, closing connection')
+        except ValueError:
+            # Raised by the stream reader for lines over LINE_LIMIT
+            await self.reply('500 5.5.6 Line too long, closing connection')
+
+    async def smtp_HELO(self, argument):
+        self.greeted = True
+        self.reset()
+        await self.reply(f'250 {self.frontend.hostname}')
+
+    async def smtp_EHLO(self, argument):
+        self.greeted = True
+        self.reset()
+        await self.reply(f'250-{self.frontend.hostname}\r\n250-SIZE {self.frontend.max_size}\r\n'
+                         '250-8BITMIME\r\n250 PIPELINING')
+
+    async def smtp_MAIL(self, argument):
+        match = MAIL_PATTERN.match(argument)
+        if not self.greeted:
+            await self.reply('503 5.5.1 Send HELO or EHLO first')
+        elif self.mail_from is not None:
+            await self.reply('503 5.5.1 Nested MAIL command')
+        elif match is None:
+            await self.reply('501 5.5.4 Syntax: MAIL FROM:<address>')
+        else:
+            size = SIZE_PATTERN.search(match.group(2))
+            if size is not None and int(size.group(1)) > self.frontend.max_size:
+                await self.reply('552 5.3.4 Message size exceeds fixed limit')
+                return
+            self.mail_from = match.group(1)
+            await self.reply('250 2.1.0 OK')
+
+    async def smtp_RCPT(self, argument):
+        match = RCPT_PATTERN.match(argument)
+        if self.mail_from is None:
+            await self.reply('503 5.5.1 Need MAIL command')
+        elif match is None:
+            await self.reply('501 5.5.4 Syntax: RCPT TO:<address>')
+        elif len(self.recipients) >= MAX_RECIPIENTS:
+            await self.reply('452 4.5.3 Too many recipients')
+        else:
+            self.recipients.append(match.group(1))
+            await self.reply('250 2.1.5 OK')
+
+    async def smtp_DATA(self, argument):
+        if not self.recipients:
+            await self.reply('503 5.5.1 Need RCPT command')
+            return
+        await self.reply('354 End data with <CR><LF>.<CR><LF>')
+        data = await self.read_data()
+        if data is None:
+            await self.reply('552 5.3.4 Message size exceeds fixed limit')
+        else:
+            latency, reply = await self.frontend.process(self.mail_from, self.recipients, data)
+            if latency is not None:
+                self.latencies.append(latency)
+            await self.reply(reply)
+        self.reset()
+
+    async def read_data(self):
+        """Read message lines up to the lone '.', undoing dot-stuffing. Returns None if it is too large."""
+        lines = []
+        size = 0
+        while True:
+            line = await self.readline()
+            if line in (b'.\r\n', b'.\n'):
+                break
+            if line.startswith(b'.'):
+                line = line[1:]
+            size += len(line)
+            # Keep reading an oversized message so the connection stays in sync
+            if size <= self.frontend.max_size:
+                lines.append(line)
+        return b''.join(lines) if size <= self.frontend.max_size else None
+
+    async def smtp_RSET(self, argument):
+        self.reset()
+        await self.reply('250 2.0.0 OK')
+
+    async def smtp_NOOP(self, argument):
+        await self.reply('250 2.0.0 OK')
+
+    async def smtp_VRFY(self, argument):
+        await self.reply('252 2.5.0 Cannot VRFY user')
+
+    async def smtp_QUIT(self, argument):
+        await self.reply('221 2.0.0 Bye')
+        return False
+
+async def start_server(frontend, host='127.0.0.1', port=2525):
+    """Start listening; returns the asyncio server (port 0 picks a free port)."""
+    return await asyncio.start_server(frontend.handle, host, port, limit=LINE_LIMIT)
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    return (host or 'localhost', int(port))
+
+def main():
+    parser = argparse.ArgumentParser(description='Run an SMTP receiver that scores mail at delivery time.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=2525, help='Port to listen on (default: 2525)')
+    parser.add_argument('--hostname', help='Name announced in the greeting (default: this host)')
+    parser.add_argument('--action', choices=['tag', 'reject'], default='tag', help='Tag spam with headers, or reject it with 550 (default: tag)')
+    parser.add_argument('--relay', type=parse_address, help='Forward accepted mail to this SMTP server (HOST:PORT)')
+    parser.add_argument('--maildir', help='Write accepted mail to this Maildir instead of relaying it')
+    parser.add_argument('--max-connections', type=int, default=100, help='Concurrent connections before new ones get 421 (default: 100)')
+    parser.add_argument('--max-pending', type=int, default=1000, help='Messages waiting for a verdict before new ones get 451 (default: 1000)')
+    parser.add_argument('--queue-timeout', type=float, default=5.0, help='Seconds a message waits for a scoring slot (default: 5)')
+    parser.add_argument('--max-size', type=int, default=10 * 1024 * 1024, help='Largest accepted message in bytes (default: 10 MB)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Idle seconds before a connection is closed (default: 300)')
+    parser.add_argument('--workers', type=int, default=4, help='Threads parsing and delivering messages (default: 4)')
+    parser.add_argument('--max-batch', type=int, default=256, help='Maximum messages per micro-batch (default: 256)')
+    parser.add_argument('--max-delay-ms', type=float, default=2.0, help='Maximum time to wait while filling a micro-batch (default: 2ms)')
+    parser.add_argument('--cache-size', type=int, default=100000, help='Distinct messages kept in the prediction cache, 0 to disable (default: 100000)')
+    parser.add_argument('--no-cascade', action='store_true', help='Score every message with the full model, skipping the early-exit cascade')
+    parser.add_argument('--reload-interval', type=float, default=2.0,
+                        help='Seconds between checks for a newly published model version, 0 to disable (default: 2)')
+    args = parser.parse_args()
+
+    watcher = load_watcher(args.reload_interval)
+    version = watcher.current if watcher is not None else load_model_version()
+    if version is None:
+        print("Error: Model files not found. Please run spam_detector.py first to train the model.")
+        sys.exit(1)
+    cv, svm, normalizer, index, cascade = version.cv, version.svm, version.normalizer, version.index, version.cascade
+    cache = PredictionCache(args.cache_size) if args.cache_size > 0 else None
+    # The index holds preprocessed messages, so it needs the preprocessing artifact
+    index = index if normalizer is not None else None
+    cascade = None if args.no_cascade else cascade
+    batcher = MicroBatcher(cv, svm, args.max_batch, args.max_delay_ms / 1000.0, normalizer, cache, index, cascade,
+                           watcher, use_index=True, use_cascade=not args.no_cascade)
+
+    async def serve():
+        frontend = SMTPFrontend(batcher, args.hostname, args.action, args.relay, args.maildir, args.max_connections,
+                                args.max_pending, args.max_size, args.timeout, args.queue_timeout, args.workers)
+        server = await start_server(frontend, args.host, args.port)
+        print(f"SMTP front-end listening on {args.host}:{args.port} ({args.action} mode)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            stats = frontend.stats.snapshot()
+            print(f"\n{stats['connections']} connections, {stats['messages']} messages ({stats['spam']} spam, "
+                  f"{stats['rejected']} rejected), {stats['deferred']} deferred, {stats['refused']} refused")
+            if stats['score_latency']:
+                latency = stats['score_latency']
+                print(f"Scoring latency: p50 {latency['p50_ms']:.2f} ms, p95 {latency['p95_ms']:.2f} ms, "
+                      f"p99 {latency['p99_ms']:.2f} ms")
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Shutting down SMTP front-end...")
+
+if __name__ == "__main__":
+    main()
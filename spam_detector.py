@@ -1,18 +1,18 @@
-import pandas as pd
-import numpy as np
-import re
-import pickle
 import os
 import sys
-import tkinter as tk
-from tkinter import messagebox, scrolledtext
-from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.svm import LinearSVC
-from sklearn.metrics import classification_report
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+import queue
+import threading
+from itertools import chain
+from preprocessing import CLEAN_PATTERN, TextNormalizer
+from corpus_cache import has_cached_corpus, load_cached_corpus, store_cached_corpus
+from instrumentation import stage
+from prediction_cache import PredictionCache
+from mail_ingest import MAX_MESSAGE_BYTES, message_text
+from term_stats import TermCounts, most_frequent_words, TOP_WORDS_DROPPED, MAX_RARE_COUNT
+
+# Heavy dependencies (pandas, scikit-learn, NLTK, tkinter) are imported inside the
+# functions that use them, so that scoring and training don't pay for the GUI
+# stack and the GUI doesn't pay for the training stack.
 
 # Check if running in a virtual environment
 def check_venv():
@@ -34,43 +34,31 @@ if not check_venv():
 # Function to detect file format and read accordingly
 def read_data_file(file_path):
     """
-    Detects file format and reads data accordingly, handling CSV files with incorrect extensions
+    Read a Category,Message dataset. The Feather copy written by convert_data.py
+    is memory-mapped instead when it is up to date; otherwise the format is
+    detected from the file's first bytes, handling CSV files with incorrect
+    extensions
     """
+    from convert_data import fresh_binary_dataset, read_dataset, sniff_format
+    
     print(f"Attempting to read file: {file_path}")
     
-    # First check if it's actually a CSV file regardless of extension
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            first_line = f.readline().strip()
-            if ',' in first_line and first_line.startswith('Category'):
-                print(f"File appears to be a CSV file with header: {first_line}")
-                return pd.read_csv(file_path)
-    except UnicodeDecodeError:
-        print("File is not a plain text CSV file, trying Excel formats...")
-    
-    # Try different Excel engines
+    binary_path = fresh_binary_dataset(file_path)
+    if binary_path is not None:
+        print(f"Using binary dataset {binary_path}")
+        return read_dataset(binary_path, 'feather')
+    
+    fmt, encoding = sniff_format(file_path)
+    print(f"File appears to be {fmt.upper()}" + (f" ({encoding})" if encoding else ""))
     try:
-        print("Trying openpyxl engine...")
-        return pd.read_excel(file_path, engine='openpyxl')
+        return read_dataset(file_path, fmt, encoding)
     except Exception as e:
-        print(f"openpyxl engine failed: {str(e)}")
-        
-        try:
-            print("Trying xlrd engine...")
-            return pd.read_excel(file_path, engine='xlrd')
-        except Exception as e:
-            print(f"xlrd engine failed: {str(e)}")
-            
-            # Last resort - try reading as CSV with different encodings
-            try:
-                print("Trying CSV with latin-1 encoding...")
-                return pd.read_csv(file_path, encoding='latin-1')
-            except Exception as e:
-                print(f"CSV with latin-1 encoding failed: {str(e)}")
-                raise Exception(f"Could not read file {file_path} in any supported format")
+        raise Exception(f"Could not read file {file_path} as {fmt}: {e}") from e
 
 # Download required NLTK resources
 def download_nltk_resources():
+    import nltk
+    
     try:
         nltk.download('stopwords', quiet=True)
         nltk.download('punkt', quiet=True)
@@ -81,46 +69,144 @@ def download_nltk_resources():
         print(f"Error downloading NLTK resources: {e}")
 
 # Data preprocessing functions
-def preprocess_data(df):
-    # Convert text to lowercase
-    df['message'] = df['message'].str.lower()
+def clean_and_lemmatize(messages, lem, lemmas):
+    """
+    Lowercase, clean and lemmatize a Series of messages. Tokens missing from
+    the lemmas dict are lemmatized once and added to it. Returns the
+    lemmatized messages as strings, their TermCounts, and the newly added
+    lemmas.
+    """
+    # Convert text to lowercase and clean special characters with vectorized string ops
+    with stage('lowercase', len(messages)):
+        lowered = messages.str.lower()
+    with stage('regex_clean', len(messages)):
+        token_lists = lowered.str.replace(CLEAN_PATTERN, " ", regex=True).str.split().tolist()
+    
+    # Lemmatize each unique token once and reuse the result for every occurrence
+    with stage('lemmatize') as lemmatize_stage:
+        unseen = set(chain.from_iterable(token_lists)) - lemmas.keys()
+        new_lemmas = {token: lem.lemmatize(token, pos='v') for token in unseen}
+        lemmas.update(new_lemmas)
+        token_lists = [[lemmas[token] for token in tokens] for tokens in token_lists]
+        lemmatize_stage.items = len(unseen)
+    
+    with stage('term_counts', len(messages)):
+        term_counts = TermCounts()
+        term_counts.update(token_lists)
+    return [' '.join(tokens) for tokens in token_lists], term_counts, new_lemmas
+
+# Lemmatizer and lemma cache of a preprocessing worker process, kept across its shards
+_worker_state = {}
+
+def _init_preprocess_worker():
+    from nltk.stem import WordNetLemmatizer
+    _worker_state['lem'] = WordNetLemmatizer()
+    _worker_state['lemmas'] = {}
+
+def _preprocess_shard(messages):
+    import pandas as pd
+    return clean_and_lemmatize(pd.Series(messages, dtype=object), _worker_state['lem'], _worker_state['lemmas'])
+
+def preprocess_data(df, return_artifacts=False, chunk_size=50000, workers=1):
+    """
+    Normalize the 'message' column in place: lowercase, strip special characters,
+    lemmatize, and drop the 20 most frequent and all single-occurrence words.
+    With return_artifacts=True, returns (df, normalizer, term_frequency) where
+    normalizer is a TextNormalizer that applies the same transform to new
+    messages and term_frequency is the TermCounts of lemmatized words.
     
-    # Clean text - remove special characters
-    df['message'] = df['message'].apply(lambda x: re.sub("[^'.,a-z0-9 ]+", " ", x))
+    Messages are tokenized chunk_size at a time and the term counts are
+    updated per chunk, so only one chunk's tokens are held as Python objects.
+    With workers > 1, the chunks are cleaned and lemmatized in a pool of that
+    many processes, each with its own lemma cache. Results are merged in chunk
+    order, so the output is identical to the single-process run.
+    """
+    term_frequency = TermCounts()
+    lemmas = {}
+    lemmatized = []
     
-    # Lemmatize text
-    lem = WordNetLemmatizer()
-    df['message'] = df['message'].apply(lambda x: ' '.join([lem.lemmatize(i, pos='v') for i in x.split()]))
+    def merge(texts, term_counts, new_lemmas):
+        lemmatized.extend(texts)
+        term_frequency.merge(term_counts)
+        lemmas.update(new_lemmas)
     
-    # Remove most frequent and least frequent words
-    term_frequency = pd.Series(' '.join(df['message']).split()).value_counts()
-    most_freq_words = term_frequency.head(20)
-    least_freq_words = term_frequency[term_frequency <= 1]
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        # Several shards per worker, so a slow shard doesn't leave the others idle
+        chunk_size = max(1, min(chunk_size, -(-len(df) // (4 * workers))))
+        shards = (df['message'].iloc[start:start + chunk_size].tolist() for start in range(0, len(df), chunk_size))
+        with stage('preprocess_shards', len(df)), ProcessPoolExecutor(workers, initializer=_init_preprocess_worker) as pool:
+            # map yields results in submission order, whichever worker finishes first
+            for result in pool.map(_preprocess_shard, shards):
+                merge(*result)
+    else:
+        from nltk.stem import WordNetLemmatizer
+        lem = WordNetLemmatizer()
+        for start in range(0, len(df), chunk_size):
+            merge(*clean_and_lemmatize(df['message'].iloc[start:start + chunk_size], lem, lemmas))
     
-    df['message'] = df['message'].apply(lambda x: ' '.join([word for word in x.split() if word not in most_freq_words]))
-    df['message'] = df['message'].apply(lambda x: ' '.join([word for word in x.split() if word not in least_freq_words]))
+    # Remove most frequent and least frequent words
+    with stage('frequency_filter', len(df)):
+        most_freq_words = most_frequent_words(term_frequency, TOP_WORDS_DROPPED)
+        least_freq_words = frozenset(term_frequency.rare(MAX_RARE_COUNT))
+        dropped_words = most_freq_words | least_freq_words
+        
+        df['message'] = [' '.join([word for word in text.split() if word not in dropped_words]) for text in lemmatized]
     
+    if return_artifacts:
+        return df, TextNormalizer(lemmas, most_freq_words, least_freq_words), term_frequency
     return df
 
+# Read and preprocess the dataset, reusing the cached result when the file is unchanged
+def load_preprocessed_corpus(file_path, use_cache=True, workers=1):
+    """
+    Return (df, normalizer, term_frequency) for the dataset at file_path, with
+    df['message'] preprocessed and df['spam'] converted to 1/0 labels.
+    workers is passed on to preprocess_data.
+    """
+    if use_cache:
+        cached = load_cached_corpus(file_path)
+        if cached is not None:
+            print(f"Using cached preprocessed corpus for {file_path} ({len(cached[0])} rows)")
+            return cached
+    
+    # Read the dataset using the new function
+    with stage('file_read') as read_stage:
+        df = read_data_file(file_path)
+        read_stage.items = len(df)
+    print(f"Successfully read file with {len(df)} rows and columns: {df.columns.tolist()}")
+    
+    # Ensure correct column names
+    if 'Category' in df.columns and 'Message' in df.columns:
+        print("Renaming columns from 'Category'/'Message' to 'spam'/'message'")
+        df.columns = ['spam', 'message']
+    
+    # Preprocess data
+    print("Preprocessing data...")
+    df, normalizer, term_frequency = preprocess_data(df, return_artifacts=True, workers=workers)
+    
+    # Convert categorical labels to binary
+    print("Converting labels to binary...")
+    df['spam'] = (df['spam'] == 'spam').astype(int)
+    
+    if use_cache:
+        try:
+            store_cached_corpus(file_path, df, normalizer, term_frequency)
+        except Exception as e:
+            print(f"Could not cache preprocessed corpus: {e}")
+    
+    return df, normalizer, term_frequency
+
 # Train model function
-def train_model(file_path):
+def train_model(file_path, use_cache=True, workers=1):
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.svm import LinearSVC
+    from sklearn.metrics import classification_report
+    
     try:
-        # Read the dataset using the new function
-        df = read_data_file(file_path)
-        print(f"Successfully read file with {len(df)} rows and columns: {df.columns.tolist()}")
-        
-        # Ensure correct column names
-        if 'Category' in df.columns and 'Message' in df.columns:
-            print("Renaming columns from 'Category'/'Message' to 'spam'/'message'")
-            df.columns = ['spam', 'message']
-        
-        # Preprocess data
-        print("Preprocessing data...")
-        df = preprocess_data(df)
-        
-        # Convert categorical labels to binary
-        print("Converting labels to binary...")
-        df['spam'] = df['spam'].apply(lambda x: 1 if x == 'spam' else 0)
+        df, normalizer, term_frequency = load_preprocessed_corpus(file_path, use_cache, workers)
         
         # Split features and target
         x = df['message']
@@ -130,57 +216,141 @@ def train_model(file_path):
         x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.3, random_state=42)
         
         # Vectorize text data
-        cv = CountVectorizer()
-        x_train_cv = cv.fit_transform(x_train)
-        x_test_cv = cv.transform(x_test)
+        with stage('vectorize', len(x)):
+            # int32 counts halve the matrices' memory; no message repeats a word 2**31 times
+            cv = CountVectorizer(dtype=np.int32)
+            x_train_cv = cv.fit_transform(x_train)
+            x_test_cv = cv.transform(x_test)
         
         # Train model
-        svm = LinearSVC()
-        svm.fit(x_train_cv, y_train)
+        with stage('fit', len(x_train)):
+            svm = LinearSVC()
+            svm.fit(x_train_cv, y_train)
         
         # Evaluate model
-        y_pred = svm.predict(x_test_cv)
+        with stage('predict', len(x_test)):
+            y_pred = svm.predict(x_test_cv)
         report = classification_report(y_test, y_pred)
         print("Model Training Complete")
         print("Classification Report:")
         print(report)
         
-        # Save model and vectorizer
-        os.makedirs('spam_nlp', exist_ok=True)
-        pickle.dump(cv, open('spam_nlp/cv.pkl', 'wb'))
-        pickle.dump(svm, open('spam_nlp/svm.pkl', 'wb'))
-        
-        print("Model and vectorizer saved successfully.")
+        # Calibrate the early-exit cascade on half of the test split and report it on the other half
+        from cascade import fit_cascade, evaluate_cascade, print_evaluation
+        x_calibration, x_evaluation, _, y_evaluation = train_test_split(
+            x_test, y_test, test_size=0.5, random_state=42, stratify=y_test)
+        cascade = fit_cascade(cv, svm, x_train_cv, y_train, x_calibration.tolist())
+        print_evaluation(cascade, evaluate_cascade(cascade, cv, svm, x_evaluation.tolist(), y_evaluation))
+        
+        # Start from the spam reported in production, then index the training spam, so that
+        # campaign variants are recognized without the model
+        from near_duplicate import NearDuplicateIndex, with_reported
+        index = with_reported(NearDuplicateIndex(), normalizer)
+        reported = len(index)
+        index.add(x_train[y_train == 1].tolist())
+        print(f"Near-duplicate index built from {len(index)} distinct spam messages ({reported} reported in production).")
+        
+        # Publish the model with its cascade and index as one version, so running servers switch to all three at once
+        from model_store import classification_metrics
+        save_model(cv, svm, normalizer, term_frequency, classification_metrics(y_test, y_pred), cascade, index)
         return True
         
     except Exception as e:
         print(f"Error training model: {e}")
         return False
 
+# Save model function
+def save_model(cv, svm, normalizer, term_frequency, metrics=None, cascade=None, index=None):
+    """
+    Publish the model, with its cascade and near-duplicate index if given, as a
+    new version of the model store (see model_store.py), which also replaces
+    the files in spam_nlp/ atomically, and save the term statistics used by
+    retrain.py.
+    """
+    from model_store import publish_model
+    publish_model(cv, svm, normalizer, metrics, term_frequency.documents, cascade, index)
+    term_frequency.save()
+    
+    print("Model, vectorizer and preprocessing artifact saved successfully.")
+
 # Load model function
-def load_model():
+def load_model_version():
+    """
+    Load the model with the normalizer, cascade and index that belong to it,
+    from the published version if there is one (see model_store.py). Returns
+    None if no model can be loaded.
+    """
     try:
-        cv = pickle.load(open('spam_nlp/cv.pkl', 'rb'))
-        svm = pickle.load(open('spam_nlp/svm.pkl', 'rb'))
-        return cv, svm
+        from model_store import load_serving_model
+        return load_serving_model()
     except Exception as e:
         print(f"Error loading model: {e}")
+        return None
+
+def load_model():
+    version = load_model_version()
+    if version is None:
         return None, None
+    return version.cv, version.svm
+
+# Read the text of an email file for scoring
+def read_email_file(path):
+    """
+    Return the subject and body text of an .eml file, or the contents of any
+    other file read as text.
+    """
+    if not path.lower().endswith('.eml'):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    
+    with open(path, 'rb') as f:
+        return message_text(f.read(MAX_MESSAGE_BYTES))
 
 # GUI Application
 class SpamDetectorApp:
+    # Delay after the last keystroke before live scoring runs
+    LIVE_DELAY_MS = 400
+    # How often the UI thread picks up results from the scoring workers
+    POLL_INTERVAL_MS = 50
+    
     def __init__(self, root):
+        from tkinter import messagebox
+        from fused_scorer import load_fused_scorer
+        
         self.root = root
-        self.cv, self.svm = load_model()
+        # The vectorizer, SVM, normalizer, index and cascade all come from the same version
+        version = load_model_version()
+        self.cv, self.svm = (version.cv, version.svm) if version is not None else (None, None)
+        self.normalizer = version.normalizer if version is not None else None
+        # Live checking rescores the same text often, and mailboxes repeat messages
+        self.cache = PredictionCache(max_entries=10000)
+        # The index holds preprocessed messages, so it needs the preprocessing artifact
+        self.index = version.index if version is not None and self.normalizer is not None else None
+        # Confident messages are decided by the cascade's first stage without the full model
+        self.cascade = version.cascade if version is not None else None
         
         if self.cv is None or self.svm is None:
             messagebox.showerror("Error", "Failed to load model. Please train the model first.")
             self.root.destroy()
             return
+        # Messages reaching the full model are scored without building a sparse matrix
+        self.fused = load_fused_scorer(self.cv, self.svm)
+        
+        # Scoring runs on background threads; the UI thread only reads the results queue
+        self.text_requests = queue.Queue()
+        self.results = queue.Queue()
+        self.latest_text_request = 0
+        self.live_job = None
+        self.files_running = False
+        threading.Thread(target=self.text_worker, name="text-scorer", daemon=True).start()
         
         self.setup_ui()
+        self.root.after(self.POLL_INTERVAL_MS, self.poll_results)
     
     def setup_ui(self):
+        import tkinter as tk
+        from tkinter import scrolledtext
+        
         self.root.title("Spam Email Detector")
         
         # Set window size and position
@@ -253,6 +423,27 @@ class SpamDetectorApp:
         )
         self.clear_button.pack(side=tk.LEFT)
         
+        # Open files button
+        self.open_button = tk.Button(
+            buttons_frame, 
+            text="Open Files...", 
+            command=self.open_files, 
+            font=("Helvetica", 14),
+            bg="#9E9E9E", 
+            fg="white",
+            padx=20, 
+            pady=10,
+            borderwidth=0,
+            cursor="hand2"
+        )
+        self.open_button.pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Live scoring toggle
+        self.live_var = tk.BooleanVar(value=True)
+        live_check = tk.Checkbutton(buttons_frame, text="Check as I type", variable=self.live_var, font=("Helvetica", 12), bg="#F5F5F5")
+        live_check.pack(side=tk.RIGHT)
+        self.text_box.bind("<<Modified>>", self.on_text_modified)
+        
         # Result frame
         self.result_frame = tk.Frame(content_frame, bg="#F5F5F5", pady=20)
         self.result_frame.pack(fill=tk.X)
@@ -261,11 +452,19 @@ class SpamDetectorApp:
         self.result_label = tk.Label(self.result_frame, text="", font=("Helvetica", 16, "bold"), bg="#F5F5F5")
         self.result_label.pack()
         
+        # File scoring progress and results
+        from tkinter import ttk
+        self.progress = ttk.Progressbar(self.result_frame, mode='determinate')
+        self.progress_label = tk.Label(self.result_frame, text="", font=("Helvetica", 11), bg="#F5F5F5", fg="#333333")
+        self.file_results = tk.Listbox(self.result_frame, height=6, font=("Arial", 11))
+        
         # Bind hover effects
         self.check_button.bind("<Enter>", lambda e: self.on_enter(e, self.check_button, "#3367D6"))
         self.check_button.bind("<Leave>", lambda e: self.on_leave(e, self.check_button, "#4285F4"))
         self.clear_button.bind("<Enter>", lambda e: self.on_enter(e, self.clear_button, "#757575"))
         self.clear_button.bind("<Leave>", lambda e: self.on_leave(e, self.clear_button, "#9E9E9E"))
+        self.open_button.bind("<Enter>", lambda e: self.on_enter(e, self.open_button, "#757575"))
+        self.open_button.bind("<Leave>", lambda e: self.on_leave(e, self.open_button, "#9E9E9E"))
         
         # Footer
         footer_frame = tk.Frame(self.root, bg="#E0E0E0", padx=20, pady=10)
@@ -286,38 +485,200 @@ class SpamDetectorApp:
     def on_leave(self, event, button, color):
         button.config(bg=color)
     
+    def predict(self, texts):
+        """Preprocess, vectorize and classify a list of messages. Safe to call from worker threads."""
+        if self.normalizer is not None:
+            with stage('normalize', len(texts)):
+                texts = self.normalizer.transform(texts)
+        return self.cache.predict(texts, self.score_uncached)
+    
+    def score_uncached(self, texts):
+        # Near-duplicates of known spam are answered by the index without the model
+        if self.index is not None:
+            return self.index.predict(texts, self.score_cascade)
+        return self.score_cascade(texts)
+    
+    def score_cascade(self, texts):
+        if self.cascade is not None:
+            return self.cascade.predict(texts, self.vectorize_and_predict)
+        return self.vectorize_and_predict(texts)
+    
+    def vectorize_and_predict(self, texts):
+        if self.fused is not None:
+            return self.fused.predict(texts)
+        with stage('vectorize', len(texts)):
+            features = self.cv.transform(texts)
+        with stage('predict', len(texts)):
+            return self.svm.predict(features)
+    
+    def text_worker(self):
+        """Score the text box contents, skipping requests superseded while they waited."""
+        while True:
+            request_id, text = self.text_requests.get()
+            if request_id != self.latest_text_request:
+                continue
+            try:
+                self.results.put(('text', request_id, self.predict([text])[0]))
+            except Exception as e:
+                self.results.put(('error', request_id, str(e)))
+    
+    def submit_text(self, text):
+        self.latest_text_request += 1
+        self.text_requests.put((self.latest_text_request, text))
+    
+    def on_text_modified(self, event=None):
+        self.text_box.edit_modified(False)
+        if self.live_job is not None:
+            self.root.after_cancel(self.live_job)
+            self.live_job = None
+        if self.live_var.get():
+            self.live_job = self.root.after(self.LIVE_DELAY_MS, self.live_check)
+    
+    def live_check(self):
+        import tkinter as tk
+        
+        self.live_job = None
+        user_text = self.text_box.get("1.0", tk.END).strip()
+        if user_text:
+            self.submit_text(user_text)
+        else:
+            # Cancel any pending result for text that no longer exists
+            self.latest_text_request += 1
+            self.result_label.config(text="")
+    
     def check_spam(self):
+        import tkinter as tk
+        from tkinter import messagebox
+        
         user_text = self.text_box.get("1.0", tk.END).strip()
         
         if not user_text:
             messagebox.showerror("Error", "You didn't type anything. Enter an email to check.")
             return
         
-        try:
-            # Check if models are loaded properly
-            if self.cv is None or self.svm is None:
-                messagebox.showerror("Error", "Model not loaded properly. Please restart the application.")
-                return
-                
-            # Transform text using the loaded vectorizer
-            text_transformed = self.cv.transform([user_text])
-            # Predict using the loaded model
-            prediction = self.svm.predict(text_transformed)
-            
-            # Display result
-            self.result_frame.config(bg="#F5F5F5")
-            if prediction[0] == 1:
-                self.result_label.config(text="Result: This email is SPAM", fg="#D32F2F")
-                messagebox.showwarning("Result", "This email has been classified as SPAM.")
-            else:
-                self.result_label.config(text="Result: This email is NOT spam", fg="#388E3C")
-                messagebox.showinfo("Result", "This email has been classified as NOT spam.")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        # Check if models are loaded properly
+        if self.cv is None or self.svm is None:
+            messagebox.showerror("Error", "Model not loaded properly. Please restart the application.")
+            return
+        
+        self.result_label.config(text="Analyzing...", fg="#757575")
+        self.submit_text(user_text)
+    
+    def show_prediction(self, prediction):
+        # Display result
+        self.result_frame.config(bg="#F5F5F5")
+        if prediction == 1:
+            self.result_label.config(text="Result: This email is SPAM", fg="#D32F2F")
+        else:
+            self.result_label.config(text="Result: This email is NOT spam", fg="#388E3C")
+    
+    def open_files(self):
+        import tkinter as tk
+        from tkinter import filedialog
+        
+        if self.files_running:
+            return
+        paths = filedialog.askopenfilenames(
+            title="Select emails to check",
+            filetypes=[("Email files", "*.eml"), ("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not paths:
+            return
+        
+        self.files_running = True
+        self.open_button.config(state=tk.DISABLED)
+        self.file_results.delete(0, tk.END)
+        self.progress.config(maximum=len(paths), value=0)
+        self.progress.pack(fill=tk.X, pady=(10, 0))
+        self.progress_label.config(text=f"Checking {len(paths)} files...")
+        self.progress_label.pack()
+        self.file_results.pack(fill=tk.X, pady=(5, 0))
+        threading.Thread(target=self.score_files, args=(list(paths),), name="file-scorer", daemon=True).start()
+    
+    def score_files(self, paths, batch_size=64):
+        """Read files concurrently and score them in batches, reporting progress to the UI thread."""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        def read(path):
+            try:
+                return path, read_email_file(path), None
+            except Exception as e:
+                return path, None, str(e)
+        
+        done = 0
+        spam = 0
+        batch = []
+        
+        def flush():
+            nonlocal done, spam
+            try:
+                predictions = self.predict([text for _, text in batch])
+            except Exception as e:
+                predictions = None
+                error = str(e)
+            for index, (path, _) in enumerate(batch):
+                if predictions is None:
+                    self.results.put(('file', os.path.basename(path), f"error: {error}"))
+                    continue
+                is_spam = predictions[index] == 1
+                spam += int(is_spam)
+                self.results.put(('file', os.path.basename(path), 'SPAM' if is_spam else 'NOT spam'))
+            done += len(batch)
+            batch.clear()
+            self.results.put(('progress', done, len(paths), spam))
+        
+        with ThreadPoolExecutor(max_workers=min(8, len(paths))) as executor:
+            for future in as_completed([executor.submit(read, path) for path in paths]):
+                path, text, error = future.result()
+                if error is not None:
+                    done += 1
+                    self.results.put(('file', os.path.basename(path), f"error: {error}"))
+                    self.results.put(('progress', done, len(paths), spam))
+                    continue
+                batch.append((path, text))
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+        self.results.put(('files_done', done, len(paths), spam))
+    
+    def poll_results(self):
+        """Apply results posted by the scoring threads. Runs on the UI thread."""
+        import tkinter as tk
+        from tkinter import messagebox
+        
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            kind = result[0]
+            if kind == 'text':
+                # Drop results for text that has changed since the request was made
+                if result[1] == self.latest_text_request:
+                    self.show_prediction(result[2])
+            elif kind == 'error':
+                if result[1] == self.latest_text_request:
+                    self.result_label.config(text="")
+                    messagebox.showerror("Error", f"An error occurred: {result[2]}")
+            elif kind == 'file':
+                self.file_results.insert(tk.END, f"{result[1]}  -  {result[2]}")
+            elif kind in ('progress', 'files_done'):
+                _, done, total, spam = result
+                self.progress.config(value=done)
+                if kind == 'files_done':
+                    self.progress_label.config(text=f"Checked {total} files, {spam} classified as spam")
+                    self.files_running = False
+                    self.open_button.config(state=tk.NORMAL)
+                else:
+                    self.progress_label.config(text=f"Checked {done} of {total} files ({spam} spam so far)...")
+        self.root.after(self.POLL_INTERVAL_MS, self.poll_results)
     
     def clear_text(self):
+        import tkinter as tk
+        
         self.text_box.delete("1.0", tk.END)
+        self.latest_text_request += 1
         self.result_label.config(text="")
 
 # Main function
@@ -325,7 +686,6 @@ def main():
     # Check if model files exist, if not train the model
     if not os.path.exists('spam_nlp/cv.pkl') or not os.path.exists('spam_nlp/svm.pkl'):
         print("Model files not found. Training new model...")
-        download_nltk_resources()
         
         # Look for the dataset file
         data_file = None
@@ -340,8 +700,13 @@ def main():
             print(f"Found dataset: {data_file}")
         
         if data_file:
+            # NLTK resources are only needed when the preprocessed corpus isn't cached
+            if not has_cached_corpus(data_file):
+                download_nltk_resources()
             print(f"Training model using dataset: {data_file}")
-            success = train_model(data_file)
+            # Preprocessing runs in this many processes; the output is the same for any number
+            workers = int(os.environ.get('SPAM_PREPROCESS_WORKERS', '1'))
+            success = train_model(data_file, workers=workers)
             if not success:
                 print("Failed to train model. Exiting...")
                 return
@@ -353,6 +718,7 @@ def main():
     
     # Start the GUI application
     print("Starting GUI application...")
+    import tkinter as tk
     root = tk.Tk()
     app = SpamDetectorApp(root)
     root.mainloop()
@@ -0,0 +1,272 @@
+"""
+Streaming term statistics for the Spam Email Detector project.
+
+preprocess_data drops the 20 most frequent words and every word seen only
+once, which needs corpus-wide term counts. The counters here are updated one
+chunk of token lists at a time, so the tokens of the whole corpus never exist
+in memory at once:
+
+  - TermCounts keeps exact counts as a dict from term to row plus a NumPy
+    count array. Memory grows with the vocabulary, not the corpus.
+  - SketchTermCounts keeps approximate counts in fixed memory: a count-min
+    sketch for every term plus the most frequent candidates, for corpora whose
+    vocabulary does not fit in RAM either. Estimates never undercount, so a
+    word it calls rare really is rare.
+
+Both are saved as a single NPZ file, so the filters can be recomputed
+without reading the corpus again.
+"""
+
+import os
+import zlib
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+
+TERM_COUNTS_PATH = 'spam_nlp/term_counts.npz'
+
+# The filters applied by preprocess_data
+TOP_WORDS_DROPPED = 20
+MAX_RARE_COUNT = 1
+
+def _encode_terms(terms):
+    """Pack terms into one UTF-8 buffer with row offsets, as corpus_cache stores messages."""
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(term) for term in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _decode_terms(buffer, offsets):
+    data = buffer.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+def _save_npz(path, **arrays):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Write to a temporary file first so readers never see partial statistics
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temp_path, path)
+
+class TermCounts:
+    """
+    Exact term counts, updated a chunk at a time. Rows are assigned in the
+    order terms are first seen, so most_common breaks ties the same way as
+    collections.Counter over the same tokens. Supports the read-only mapping
+    protocol, so dict(counts) gives a plain {term: count} dict.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.counts = np.zeros(1024, dtype=np.int64)
+        self.tokens = 0
+        self.documents = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, term):
+        return term in self.rows
+
+    def __getitem__(self, term):
+        return int(self.counts[self.rows[term]])
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def keys(self):
+        return self.rows.keys()
+
+    def items(self):
+        counts = self.counts
+        return ((term, int(counts[row])) for term, row in self.rows.items())
+
+    def get(self, term, default=0):
+        row = self.rows.get(term)
+        return default if row is None else int(self.counts[row])
+
+    def _add(self, terms, counts):
+        rows = self.rows
+        indices = np.fromiter((rows.setdefault(term, len(rows)) for term in terms), dtype=np.int64, count=len(terms))
+        if len(rows) > len(self.counts):
+            grown = np.zeros(max(len(rows), 2 * len(self.counts)), dtype=np.int64)
+            grown[:len(self.counts)] = self.counts
+            self.counts = grown
+        # Each term appears once in terms, so plain fancy-index addition is safe
+        self.counts[indices] += counts
+
+    def update(self, token_lists):
+        """Add the tokens of a chunk of messages, one list of tokens per message."""
+        chunk = Counter(chain.from_iterable(token_lists))
+        counts = np.fromiter(chunk.values(), dtype=np.int64, count=len(chunk))
+        self._add(list(chunk), counts)
+        self.tokens += int(counts.sum())
+        self.documents += len(token_lists)
+
+    def merge(self, other):
+        """Add the counts of another TermCounts, as when combining per-worker statistics."""
+        self._add(list(other.rows), other.counts[:len(other)])
+        self.tokens += other.tokens
+        self.documents += other.documents
+        return self
+
+    def most_common(self, n):
+        """Return the n most frequent (term, count) pairs, most frequent first."""
+        counts = self.counts[:len(self.rows)]
+        terms = list(self.rows)
+        order = np.argsort(-counts, kind='stable')[:n]
+        return [(terms[row], int(counts[row])) for row in order]
+
+    def rare(self, max_count=MAX_RARE_COUNT):
+        """Return every term seen at most max_count times."""
+        counts = self.counts[:len(self.rows)]
+        terms = list(self.rows)
+        return [terms[row] for row in np.flatnonzero(counts <= max_count)]
+
+    def rare_among(self, terms, max_count=MAX_RARE_COUNT):
+        """Return the subset of terms seen at most max_count times (unseen terms included)."""
+        return {term for term in terms if self.get(term) <= max_count}
+
+    def to_dict(self):
+        return {'counts': dict(self.items()), 'tokens': self.tokens, 'documents': self.documents}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        counts = data['counts']
+        stats._add(list(counts), np.fromiter(counts.values(), dtype=np.int64, count=len(counts)))
+        stats.tokens = data['tokens']
+        stats.documents = data['documents']
+        return stats
+
+    def save(self, path=TERM_COUNTS_PATH):
+        buffer, offsets = _encode_terms(self.rows)
+        _save_npz(path, kind=np.array('exact'), terms=buffer, offsets=offsets, counts=self.counts[:len(self.rows)],
+                  totals=np.array([self.tokens, self.documents], dtype=np.int64))
+
+    @classmethod
+    def from_arrays(cls, data):
+        stats = cls()
+        terms = _decode_terms(data['terms'], data['offsets'])
+        stats.rows = {term: row for row, term in enumerate(terms)}
+        stats.counts = data['counts'].astype(np.int64)
+        stats.tokens, stats.documents = (int(total) for total in data['totals'])
+        return stats
+
+class CountMinSketch:
+    """
+    Count-min sketch: depth rows of width counters, each indexed by its own
+    hash of the term. A term's estimate is the smallest of its counters, which
+    is never below its true count and exceeds it only through collisions.
+    """
+
+    def __init__(self, width=2 ** 22, depth=4, seed=1):
+        if width & (width - 1):
+            raise ValueError(f"Sketch width must be a power of two, got {width}")
+        self.width = width
+        self.depth = depth
+        self.bits = width.bit_length() - 1
+        # Multiply-shift hash family over the CRC32 of each term, as in near_duplicate
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=depth, dtype=np.uint64)
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+
+    def _columns(self, terms):
+        hashes = np.fromiter((zlib.crc32(term.encode('utf-8')) for term in terms), dtype=np.uint64, count=len(terms))
+        return (self.a[:, None] * hashes[None, :] + self.b[:, None]) >> np.uint64(64 - self.bits)
+
+    def add(self, terms, counts):
+        columns = self._columns(terms)
+        counts = np.asarray(counts, dtype=np.uint32)
+        for row in range(self.depth):
+            # add.at, because different terms can share a counter
+            np.add.at(self.table[row], columns[row], counts)
+
+    def estimate(self, terms):
+        columns = self._columns(terms)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+class SketchTermCounts:
+    """
+    Approximate term counts in fixed memory: every term goes into a
+    CountMinSketch, and the candidates terms with the largest estimates are
+    tracked by name for most_common. Rare terms cannot be listed, only tested
+    with rare_among, so the filters are applied per chunk.
+    """
+
+    def __init__(self, width=2 ** 22, depth=4, candidates=1000, seed=1):
+        self.sketch = CountMinSketch(width, depth, seed)
+        self.capacity = candidates
+        self.candidates = {}
+        self.tokens = 0
+        self.documents = 0
+
+    def update(self, token_lists):
+        """Add the tokens of a chunk of messages, one list of tokens per message."""
+        chunk = Counter(chain.from_iterable(token_lists))
+        terms = list(chunk)
+        counts = np.fromiter(chunk.values(), dtype=np.int64, count=len(chunk))
+        self.sketch.add(terms, counts)
+        self.tokens += int(counts.sum())
+        self.documents += len(token_lists)
+
+        # Estimates only grow, so only terms of this chunk can displace a candidate
+        estimates = self.sketch.estimate(terms)
+        floor = min(self.candidates.values()) if len(self.candidates) >= self.capacity else 0
+        for index in np.flatnonzero(estimates > floor):
+            self.candidates[terms[index]] = int(estimates[index])
+        if len(self.candidates) > 2 * self.capacity:
+            self._trim()
+
+    def _trim(self):
+        kept = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)[:self.capacity]
+        self.candidates = dict(kept)
+
+    def get(self, term, default=0):
+        return int(self.sketch.estimate([term])[0]) or default
+
+    def most_common(self, n):
+        """Return the n (term, estimated count) pairs with the largest estimates."""
+        return sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def rare_among(self, terms, max_count=MAX_RARE_COUNT):
+        """Return the subset of terms whose estimated count is at most max_count."""
+        terms = list(terms)
+        if not terms:
+            return set()
+        return {term for term, estimate in zip(terms, self.sketch.estimate(terms)) if estimate <= max_count}
+
+    def save(self, path=TERM_COUNTS_PATH):
+        self._trim()
+        buffer, offsets = _encode_terms(self.candidates)
+        _save_npz(path, kind=np.array('sketch'), table=self.sketch.table, a=self.sketch.a, b=self.sketch.b,
+                  terms=buffer, offsets=offsets, counts=np.array(list(self.candidates.values()), dtype=np.int64),
+                  totals=np.array([self.tokens, self.documents, self.capacity], dtype=np.int64))
+
+    @classmethod
+    def from_arrays(cls, data):
+        depth, width = data['table'].shape
+        tokens, documents, capacity = (int(total) for total in data['totals'])
+        stats = cls(width, depth, capacity)
+        stats.sketch.table = data['table']
+        stats.sketch.a = data['a']
+        stats.sketch.b = data['b']
+        stats.candidates = dict(zip(_decode_terms(data['terms'], data['offsets']), data['counts'].tolist()))
+        stats.tokens = tokens
+        stats.documents = documents
+        return stats
+
+def load_term_counts(path=TERM_COUNTS_PATH):
+    """Load saved TermCounts or SketchTermCounts. Returns None if the file does not exist."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if str(data['kind']) == 'sketch':
+            return SketchTermCounts.from_arrays(data)
+        return TermCounts.from_arrays(data)
+
+def most_frequent_words(stats, n=TOP_WORDS_DROPPED):
+    """The top-n words dropped by preprocessing."""
+    return frozenset(word for word, _ in stats.most_common(n))
@@ -1,6 +1,14 @@
-import pickle
 import sys
 import os
+import csv
+import json
+import time
+import argparse
+from itertools import islice
+from preprocessing import load_normalizer
+from instrumentation import stage
+from prediction_cache import PredictionCache, cache_key
+from mail_ingest import MAIL_FORMATS, detect_mail_format, iter_mail
 
 # Check if running in a virtual environment
 def check_venv():
@@ -19,19 +27,96 @@ if not check_venv():
     print("\nExiting. Please activate the virtual environment and try again.")
     sys.exit(1)
 
-def load_model():
+def load_model_version():
+    """
+    Load the model with the normalizer, cascade and index that belong to it,
+    from the published version if there is one (see model_store.py). Returns
+    None if no model can be loaded.
+    """
     try:
-        cv = pickle.load(open('spam_nlp/cv.pkl', 'rb'))
-        svm = pickle.load(open('spam_nlp/svm.pkl', 'rb'))
-        return cv, svm
+        from model_store import load_serving_model
+        return load_serving_model()
     except Exception as e:
         print(f"Error loading model: {e}")
+        return None
+
+def load_model():
+    version = load_model_version()
+    if version is None:
         return None, None
+    return version.cv, version.svm
 
-def check_spam(text):
-    cv, svm = load_model()
+def compact_model_is_current(path='spam_nlp/model.bin'):
+    """
+    True if an exported compact model exists, was exported from the current
+    model and keeps full float32 weights. When a version has been published
+    the export must name it; otherwise it must not be older than the pickled
+    model. Quantized exports can change verdicts, so they are only used
+    through compact_model.py directly.
+    """
+    from model_store import current_version_name
+    try:
+        # Header layout: 8-byte magic, 8-byte little-endian length, JSON header
+        with open(path, 'rb') as f:
+            f.seek(8)
+            header = json.loads(f.read(int.from_bytes(f.read(8), 'little')))
+        current = current_version_name()
+        if current is not None:
+            if header.get('model_version') != current:
+                return False
+        elif os.path.getmtime(path) < max(os.path.getmtime('spam_nlp/cv.pkl'), os.path.getmtime('spam_nlp/svm.pkl')):
+            return False
+        return header.get('weight_dtype') == 'float32'
+    except (OSError, ValueError):
+        return False
+
+def load_predictor():
+    """
+    Load the cheapest available scorer and return a predict(texts) function,
+    or None if no model is available.
+
+    The compact model (see compact_model.py) is memory-mapped and scored with
+    NumPy only, so it is preferred when it is up to date. Otherwise the pickled
+    vectorizer and SVM are loaded, which imports scikit-learn, and scored
+    with fused_scorer.FusedScorer where the vectorizer settings allow it.
+    """
+    if compact_model_is_current():
+        try:
+            from compact_model import CompactScorer
+            from model_store import current_file
+            # The normalizer of the version the compact model was exported from
+            scorer = CompactScorer(normalizer=load_normalizer(current_file('preprocess.pkl')))
+            
+            def predict_compact(texts):
+                with stage('predict', len(texts)):
+                    return scorer.predict(texts)
+            return predict_compact
+        except Exception as e:
+            print(f"Error loading compact model, falling back to the pickled model: {e}")
+    
+    version = load_model_version()
+    if version is None:
+        return None
+    from fused_scorer import load_fused_scorer
+    cv, svm, normalizer, cascade = version.cv, version.svm, version.normalizer, version.cascade
+    # A few messages at a time, so skip building a sparse matrix
+    fused = load_fused_scorer(cv, svm)
+    predict_full = fused.predict if fused is not None else lambda texts: vectorize_and_predict(cv, svm, texts)
     
-    if cv is None or svm is None:
+    def predict(texts):
+        if normalizer is not None:
+            with stage('normalize', len(texts)):
+                texts = normalizer.transform(texts)
+        if cascade is not None:
+            return cascade.predict(texts, predict_full)
+        return predict_full(texts)
+    return predict
+
+# Predictions of check_spam, reused when it is called again in the same process
+_prediction_cache = PredictionCache()
+
+def check_spam(text):
+    if not os.path.exists('spam_nlp/cv.pkl') or not os.path.exists('spam_nlp/svm.pkl'):
         print("Error: Model files not found. Please run spam_detector.py first to train the model.")
         return
     
@@ -40,12 +125,20 @@ def check_spam(text):
         return
     
     try:
-        # Transform text using the loaded vectorizer
-        text_transformed = cv.transform([text])
-        # Predict using the loaded model
-        prediction = svm.predict(text_transformed)
+        # A cached verdict for the same message skips loading the model entirely
+        key = cache_key(text)
+        prediction = _prediction_cache.get(key)
+        if prediction is None:
+            predict = load_predictor()
+            if predict is None:
+                print("Error: Model files not found. Please run spam_detector.py first to train the model.")
+                return
+            
+            # Preprocess, vectorize and predict using the loaded model
+            prediction = int(predict([text])[0])
+            _prediction_cache.put(key, prediction)
         
-        if prediction[0] == 1:
+        if prediction == 1:
             print("\n🚨 RESULT: This email is classified as SPAM 🚨\n")
         else:
             print("\n✅ RESULT: This email is classified as NOT SPAM ✅\n")
@@ -53,7 +146,198 @@ def check_spam(text):
     except Exception as e:
         print(f"Error during prediction: {e}")
 
+def detect_format(path):
+    """
+    Guess the input format of a batch source from its file extension, or for
+    mail sources (mbox, Maildir, .eml) from the path itself. A .txt file is
+    always one message per line; use --format mbox for an mbox named .txt.
+    """
+    if path == '-':
+        return 'text'
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    if ext == '.txt':
+        return 'text'
+    return detect_mail_format(path) or 'text'
+
+def iter_messages(stream, fmt):
+    """
+    Yield messages one at a time from an open CSV, JSONL or plain text stream.
+    Plain text input is treated as one message per line.
+    """
+    if fmt == 'csv':
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        column = len(header) - 1
+        for name in ('Message', 'message', 'text'):
+            if name in header:
+                column = header.index(name)
+                break
+        for row in reader:
+            if len(row) > column:
+                yield row[column]
+    elif fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield record
+            else:
+                yield record.get('message') or record.get('Message') or record.get('text') or ''
+    else:
+        for line in stream:
+            line = line.rstrip('\n')
+            if line.strip():
+                yield line
+
+def iter_chunks(messages, chunk_size):
+    """Group an iterable of messages into lists of at most chunk_size items."""
+    messages = iter(messages)
+    while True:
+        chunk = list(islice(messages, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def vectorize_and_predict(cv, svm, texts):
+    with stage('vectorize', len(texts)):
+        features = cv.transform(texts)
+    with stage('predict', len(texts)):
+        return svm.predict(features)
+
+def score_batch(cv, svm, messages, out, chunk_size=10000, out_format='csv', normalizer=None, cache=None, index=None,
+                cascade=None):
+    """
+    Score a stream of messages chunk by chunk and write one result per message.
+
+    Each chunk is vectorized into a single sparse matrix and predicted in one
+    call, and results are flushed before the next chunk is read, so memory
+    stays bounded by chunk_size regardless of the input size. With a
+    PredictionCache, repeated messages are only vectorized and predicted once,
+    with a NearDuplicateIndex, near-duplicates of known spam skip the model,
+    and with a CascadeClassifier, only messages its first stage is unsure
+    about reach the full model.
+    Returns a (total, spam) tuple of message counts.
+    """
+    writer = csv.writer(out) if out_format == 'csv' else None
+    if writer is not None:
+        writer.writerow(['id', 'prediction'])
+    total = 0
+    spam = 0
+    
+    def predict_full(texts):
+        if cascade is not None:
+            return cascade.predict(texts, lambda escalated: vectorize_and_predict(cv, svm, escalated))
+        return vectorize_and_predict(cv, svm, texts)
+    
+    def predict(texts):
+        if index is not None:
+            return index.predict(texts, predict_full)
+        return predict_full(texts)
+    
+    for chunk in iter_chunks(messages, chunk_size):
+        if normalizer is not None:
+            with stage('normalize', len(chunk)):
+                chunk = normalizer.transform(chunk)
+        if cache is not None:
+            predictions = cache.predict(chunk, predict)
+        else:
+            predictions = predict(chunk)
+        for offset, prediction in enumerate(predictions):
+            label = 'spam' if prediction == 1 else 'ham'
+            if writer is not None:
+                writer.writerow([total + offset, label])
+            else:
+                out.write(json.dumps({'id': total + offset, 'prediction': label}) + '\n')
+        total += len(chunk)
+        spam += sum(1 for prediction in predictions if prediction == 1)
+        out.flush()
+    return total, spam
+
+def run_batch(argv):
+    """Command line entry point for batch scoring."""
+    parser = argparse.ArgumentParser(
+        prog='test_model.py --batch',
+        description='Score many messages from a CSV, JSONL or text file (or stdin), an mbox file, a Maildir or .eml files.'
+    )
+    parser.add_argument('input', help="Input file or mail directory, or '-' to read from stdin")
+    parser.add_argument('-o', '--output', default='-', help="Output file (.csv or .jsonl), default stdout")
+    parser.add_argument('-f', '--format', choices=['csv', 'jsonl', 'text', *MAIL_FORMATS], help="Input format (default: guessed from the input)")
+    parser.add_argument('-c', '--chunk-size', type=int, default=10000, help="Messages vectorized per chunk (default: 10000)")
+    parser.add_argument('--cache-size', type=int, default=100000, help="Distinct messages remembered to skip re-scoring duplicates, 0 to disable (default: 100000)")
+    parser.add_argument('--near-duplicates', action='store_true', help="Classify near-duplicates of known spam without the model")
+    parser.add_argument('--no-cascade', action='store_true', help="Score every message with the full model, skipping the early-exit cascade")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    try:
+        in_format = args.format or detect_format(args.input)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    version = load_model_version()
+    if version is None:
+        print("Error: Model files not found. Please run spam_detector.py first to train the model.", file=sys.stderr)
+        return False
+    cv, svm, normalizer = version.cv, version.svm, version.normalizer
+    
+    out_format = 'jsonl' if detect_format(args.output) == 'jsonl' else 'csv'
+    
+    if in_format in MAIL_FORMATS:
+        # Mail sources are parsed lazily, one message at a time
+        source = None
+        messages = iter_mail(args.input, in_format)
+    else:
+        source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8', errors='replace', newline='')
+        messages = iter_messages(source, in_format)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        start = time.perf_counter()
+        cache = PredictionCache(args.cache_size) if args.cache_size > 0 else None
+        index = None
+        if args.near_duplicates:
+            # The index holds preprocessed messages, so it needs the preprocessing artifact
+            index = version.index if normalizer is not None else None
+            if index is None:
+                print("Warning: Near-duplicate index or preprocessing artifact not found, scoring every message with the model.", file=sys.stderr)
+        cascade = None if args.no_cascade else version.cascade
+        total, spam = score_batch(cv, svm, messages, out, args.chunk_size, out_format,
+                                  normalizer, cache, index, cascade)
+        elapsed = time.perf_counter() - start
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {total} messages ({spam} spam) in {elapsed:.2f}s - {rate:,.0f} messages/sec", file=sys.stderr)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Prediction cache: {stats['hit_rate']:.1%} hit rate, {stats['entries']} entries, "
+              f"{stats['evictions']} evictions, {stats['memory_bytes'] / (1024 * 1024):.1f} MB", file=sys.stderr)
+    if index is not None:
+        stats = index.stats()
+        print(f"Near-duplicate index: {stats['hits']} of {stats['queries']} messages matched known spam", file=sys.stderr)
+    if cascade is not None:
+        stats = cascade.stats()
+        print(f"Cascade: {stats['early_exits']} of {stats['messages']} messages ({stats['early_exit_rate']:.1%}) "
+              f"decided without the full model", file=sys.stderr)
+    return True
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        if not run_batch(sys.argv[2:]):
+            sys.exit(1)
+        return
+    
     print("\n===== Spam Email Detector - Command Line Test =====\n")
     
     # Check if model files exist
@@ -0,0 +1,115 @@
+"""
+Equivalence tests for the fast scoring paths of the Spam Email Detector project.
+
+Each fast path claims to give the same answer as the path it replaces: the
+fused scorer the same margins as the vectorizer and SVM, bit for bit; the
+float32 compact model the same verdicts; the prediction cache the same
+predictions as scoring directly; the near-duplicate index a match for every
+known spam message; and the saved TextNormalizer the same text as training
+preprocessing. The models are trained on mail_data.csv in memory, so nothing
+under spam_nlp/ is read or written.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fused_scorer import FusedScorer
+from compact_model import CompactScorer, export_compact_model
+from prediction_cache import PredictionCache
+from near_duplicate import NearDuplicateIndex
+from preprocessing import CLEAN_PATTERN
+
+@pytest.fixture(scope='module')
+def corpus():
+    import pandas as pd
+
+    df = pd.read_csv(os.path.join(ROOT, 'mail_data.csv')).dropna(subset=['Message'])
+    texts = [CLEAN_PATTERN.sub(' ', text.lower()) for text in df['Message'].astype(str)]
+    labels = (df['Category'] == 'spam').astype(int).to_numpy()
+    return df, texts, labels
+
+@pytest.fixture(scope='module')
+def model(corpus):
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.svm import LinearSVC
+
+    _, texts, labels = corpus
+    cv = CountVectorizer()
+    svm = LinearSVC().fit(cv.fit_transform(texts), labels)
+    return cv, svm
+
+def test_fused_margins_are_bit_identical(corpus, model):
+    _, texts, _ = corpus
+    cv, svm = model
+    scorer = FusedScorer.from_model(cv, svm)
+    margins = svm.decision_function(cv.transform(texts))
+    assert np.array_equal(scorer.decision_function(texts), margins)
+    assert np.array_equal(scorer.predict(texts), svm.predict(cv.transform(texts)))
+
+def test_compact_float32_model_agrees(corpus, model, tmp_path):
+    _, texts, _ = corpus
+    cv, svm = model
+    path = str(tmp_path / 'model.bin')
+    export_compact_model(cv, svm, path, 'float32', 'test-version')
+    scorer = CompactScorer(path)
+    assert scorer.header['model_version'] == 'test-version'
+    np.testing.assert_allclose(scorer.decision_function(texts), svm.decision_function(cv.transform(texts)),
+                               rtol=0, atol=1e-4)
+    assert np.array_equal(scorer.predict(texts), svm.predict(cv.transform(texts)))
+
+def test_prediction_cache_matches_direct_scoring(corpus, model):
+    _, texts, _ = corpus
+    cv, svm = model
+    direct = [int(prediction) for prediction in svm.predict(cv.transform(texts))]
+    cache = PredictionCache(model_files=())
+    predict = lambda batch: svm.predict(cv.transform(batch))
+    assert cache.predict(texts, predict) == direct
+
+    # Copies differing only in case and whitespace are answered from the cache
+    variants = ['  ' + text.upper().replace(' ', '\t') for text in texts]
+    calls = []
+    assert cache.predict(variants, lambda batch: calls.append(batch) or predict(batch)) == direct
+    assert not calls
+
+def test_near_duplicate_index_matches_known_spam(corpus, tmp_path):
+    _, texts, labels = corpus
+    spam = [text for text, label in zip(texts, labels) if label == 1 and text.split()]
+    index = NearDuplicateIndex()
+    index.add(spam)
+    assert all(similarity == 1.0 for similarity in index.match(spam))
+
+    # The buckets rebuilt on load give the same matches
+    path = str(tmp_path / 'spam_index.npz')
+    index.save(path)
+    assert NearDuplicateIndex.load(path).match(spam) == index.match(spam)
+
+    # Campaign variants with one word changed are matched
+    long_spam = [text.split() for text in spam if len(text.split()) >= 30]
+    variants = [' '.join(words[:15] + ['zzvariant'] + words[16:]) for words in long_spam]
+    assert variants
+    matched = sum(similarity is not None for similarity in index.match(variants))
+    assert matched >= 0.95 * len(variants)
+
+def test_normalizer_matches_training_preprocessing(corpus):
+    import pandas as pd
+
+    nltk_stem = pytest.importorskip('nltk.stem')
+    try:
+        nltk_stem.WordNetLemmatizer().lemmatize('running', pos='v')
+    except LookupError:
+        pytest.skip('WordNet is not installed')
+    from spam_detector import preprocess_data
+
+    df, _, _ = corpus
+    raw = df['Message'].astype(str).tolist()[:1000]
+    processed, normalizer, _ = preprocess_data(pd.DataFrame({'message': raw}), return_artifacts=True)
+    assert normalizer.transform(raw) == processed['message'].tolist()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Out-of-core training for the Spam Email Detector project.
+Reads the dataset in fixed-size chunks, vectorizes each chunk with a stateless
+HashingVectorizer and trains a linear SVM (SGD with hinge loss) incrementally
+with partial_fit, so memory use is bounded by the chunk size rather than the
+size of the corpus.
+
+Besides a Category,Message CSV, it can train directly on mailboxes: mbox
+files, Maildirs and .eml files given as spam and ham sources are parsed and
+decoded one message at a time.
+
+With --frequency-filter, a first pass counts the lemmatized words chunk by
+chunk (see term_stats.py), so the top-20 and single-occurrence filters of
+preprocess_data can be applied to corpora larger than memory. The counts are saved and can be reused, and
+for vocabularies too large for exact counts a count-min sketch is used.
+"""
+
+import os
+import sys
+import time
+import argparse
+from itertools import chain, islice
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from nltk.stem import WordNetLemmatizer
+from preprocessing import CLEAN_PATTERN, TextNormalizer
+from model_store import publish_model
+from mail_ingest import iter_labeled_mail
+from term_stats import TermCounts, SketchTermCounts, load_term_counts, most_frequent_words, TOP_WORDS_DROPPED, MAX_RARE_COUNT
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def iter_labeled_chunks(file_path, chunk_size):
+    """Yield (messages, labels) chunks from a Category,Message CSV file."""
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+        if 'Category' in chunk.columns and 'Message' in chunk.columns:
+            chunk = chunk.rename(columns={'Category': 'spam', 'Message': 'message'})
+        chunk = chunk.dropna(subset=['message'])
+        labels = (chunk['spam'] == 'spam').astype(np.int8).to_numpy()
+        yield chunk['message'], labels
+
+def iter_labeled_mail_chunks(spam_paths, ham_paths, chunk_size):
+    """Yield (messages, labels) chunks from spam and ham mail sources."""
+    pairs = iter_labeled_mail(spam_paths, ham_paths)
+    while True:
+        chunk = list(islice(pairs, chunk_size))
+        if not chunk:
+            return
+        labels, texts = zip(*chunk)
+        yield pd.Series(texts), np.array(labels, dtype=np.int8)
+
+def lemmatize_chunk(messages, lem, lemmas):
+    """
+    Lowercase, clean and lemmatize one chunk of messages into token lists,
+    adding newly seen tokens to the shared lemma table.
+    """
+    token_lists = messages.str.lower().str.replace(CLEAN_PATTERN, " ", regex=True).str.split().tolist()
+    for tokens in token_lists:
+        for token in tokens:
+            if token not in lemmas:
+                lemmas[token] = lem.lemmatize(token, pos='v')
+    return [[lemmas[token] for token in tokens] for tokens in token_lists]
+
+def preprocess_chunk(messages, lem, lemmas, most_freq_words=frozenset(), term_counts=None):
+    """
+    Lemmatize one chunk of messages and drop most_freq_words and, with
+    corpus-wide term_counts, the words seen at most MAX_RARE_COUNT times.
+    """
+    token_lists = lemmatize_chunk(messages, lem, lemmas)
+    dropped_words = most_freq_words
+    if term_counts is not None:
+        dropped_words = dropped_words | term_counts.rare_among(set(chain.from_iterable(token_lists)), MAX_RARE_COUNT)
+    return [' '.join([word for word in tokens if word not in dropped_words]) for tokens in token_lists]
+
+def count_terms(chunks, lem, lemmas, term_counts):
+    """Add the lemmatized words of every chunk to term_counts."""
+    for messages, _ in chunks:
+        term_counts.update(lemmatize_chunk(messages, lem, lemmas))
+    return term_counts
+
+def train_model_streaming(file_path, chunk_size=50000, n_features=2 ** 20, epochs=1, holdout_every=10, output_dir='spam_nlp',
+                          spam_paths=None, ham_paths=None, frequency_filter=False, term_stats_path=None, sketch_width=None):
+    """
+    Train a hashing vectorizer + SGD linear SVM over a CSV file in chunks, or
+    over the spam_paths and ham_paths mail sources when either is given.
+
+    With frequency_filter, the term counts are loaded from term_stats_path
+    if it exists, and otherwise counted in a first pass (in a count-min
+    sketch of sketch_width counters per row, if given) and saved to
+    term_stats_path or output_dir/term_counts.npz.
+
+    Every holdout_every-th row is kept out of training and scored in a final
+    pass, so the reported metrics are for unseen messages. Returns a dict of
+    metrics and resource usage, or None on failure.
+    """
+    try:
+        cv = HashingVectorizer(n_features=n_features, alternate_sign=False)
+        svm = SGDClassifier(loss='hinge', random_state=42)
+        lem = WordNetLemmatizer()
+        lemmas = {}
+        classes = np.array([0, 1])
+
+        def chunks():
+            if spam_paths or ham_paths:
+                return iter_labeled_mail_chunks(spam_paths or [], ham_paths or [], chunk_size)
+            return iter_labeled_chunks(file_path, chunk_size)
+
+        most_freq_words = frozenset()
+        term_counts = None
+        if frequency_filter:
+            if term_stats_path is not None:
+                term_counts = load_term_counts(term_stats_path)
+            if term_counts is not None:
+                print(f"Using term statistics from {term_stats_path} ({term_counts.documents} messages)")
+            else:
+                print("Counting terms...")
+                term_counts = SketchTermCounts(sketch_width) if sketch_width else TermCounts()
+                count_terms(chunks(), lem, lemmas, term_counts)
+                term_stats_path = term_stats_path or os.path.join(output_dir, 'term_counts.npz')
+                term_counts.save(term_stats_path)
+                print(f"Term statistics for {term_counts.documents} messages saved to {term_stats_path}")
+            most_freq_words = most_frequent_words(term_counts, TOP_WORDS_DROPPED)
+
+        start = time.perf_counter()
+        trained = 0
+        for epoch in range(epochs):
+            print(f"Epoch {epoch + 1}/{epochs}...")
+            offset = 0
+            for messages, labels in chunks():
+                train_rows = (np.arange(offset, offset + len(labels)) % holdout_every) != 0
+                offset += len(labels)
+                texts = preprocess_chunk(messages[train_rows], lem, lemmas, most_freq_words, term_counts)
+                if texts:
+                    svm.partial_fit(cv.transform(texts), labels[train_rows], classes=classes)
+                    trained += len(texts)
+        train_time = time.perf_counter() - start
+
+        # Evaluate on the held out rows with the final model
+        print("Evaluating on held out messages...")
+        true_pos = false_pos = false_neg = correct = evaluated = 0
+        offset = 0
+        for messages, labels in chunks():
+            test_rows = (np.arange(offset, offset + len(labels)) % holdout_every) == 0
+            offset += len(labels)
+            texts = preprocess_chunk(messages[test_rows], lem, lemmas, most_freq_words, term_counts)
+            if not texts:
+                continue
+            y_true = labels[test_rows]
+            y_pred = svm.predict(cv.transform(texts))
+            true_pos += int(((y_pred == 1) & (y_true == 1)).sum())
+            false_pos += int(((y_pred == 1) & (y_true == 0)).sum())
+            false_neg += int(((y_pred == 0) & (y_true == 1)).sum())
+            correct += int((y_pred == y_true).sum())
+            evaluated += len(texts)
+
+        stats = {
+            'epochs': epochs,
+            'trained_messages': trained,
+            'evaluated_messages': evaluated,
+            'train_seconds': train_time,
+            'messages_per_second': trained / train_time if train_time > 0 else 0.0,
+            'accuracy': correct / evaluated if evaluated else 0.0,
+            'spam_precision': true_pos / (true_pos + false_pos) if true_pos + false_pos else 0.0,
+            'spam_recall': true_pos / (true_pos + false_neg) if true_pos + false_neg else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+        # Publish model, vectorizer and preprocessing artifact as a version of the model store, as train_model does.
+        # A sketch cannot list its rare words; they are not in the training text, so they carry no weight anyway
+        least_freq_words = term_counts.rare(MAX_RARE_COUNT) if isinstance(term_counts, TermCounts) else ()
+        normalizer = TextNormalizer(lemmas, most_freq_words, least_freq_words)
+        metrics = {'accuracy': stats['accuracy'], 'precision': stats['spam_precision'],
+                   'recall': stats['spam_recall'], 'test_messages': evaluated}
+        publish_model(cv, svm, normalizer, metrics, offset, models_dir=os.path.join(output_dir, 'models'))
+        print(f"Model and vectorizer saved to {output_dir}/")
+        return stats
+
+    except Exception as e:
+        print(f"Error training model: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the spam model out of core with HashingVectorizer and partial_fit.')
+    parser.add_argument('data', nargs='?', default='mail_data.csv', help='Category,Message CSV file (default: mail_data.csv)')
+    parser.add_argument('--spam', nargs='+', metavar='PATH', help='Train on these mbox files, Maildirs or .eml files of spam instead of a CSV')
+    parser.add_argument('--ham', nargs='+', metavar='PATH', help='Mail sources of legitimate messages, used with --spam')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows read and vectorized at a time; bounds memory use (default: 50000)')
+    parser.add_argument('--n-features', type=int, default=2 ** 20, help='Hashing vectorizer width (default: 2**20)')
+    parser.add_argument('--epochs', type=int, default=1, help='Passes over the training data (default: 1)')
+    parser.add_argument('--holdout-every', type=int, default=10, help='Hold out every Nth row for evaluation (default: 10)')
+    parser.add_argument('--output-dir', default='spam_nlp', help='Directory to save the model to (default: spam_nlp)')
+    parser.add_argument('--frequency-filter', action='store_true', help='Count terms in a first pass and drop the 20 most frequent and single-occurrence words, as spam_detector.py does')
+    parser.add_argument('--term-stats', metavar='PATH', help='Reuse the term statistics in PATH if it exists, otherwise save them there (default: OUTPUT_DIR/term_counts.npz, recounted every run)')
+    parser.add_argument('--sketch-width', type=int, help='Count terms approximately in a count-min sketch of this many counters per row (a power of two) instead of exactly')
+    args = parser.parse_args()
+
+    stats = train_model_streaming(args.data, args.chunk_size, args.n_features, args.epochs, args.holdout_every, args.output_dir,
+                                  args.spam, args.ham, args.frequency_filter, args.term_stats, args.sketch_width)
+    if stats is None:
+        print("Failed to train model.")
+        sys.exit(1)
+
+    print("\nStreaming Training Complete")
+    print(f"  Trained on:     {stats['trained_messages']} messages over {stats['epochs']} epoch(s)")
+    print(f"  Throughput:     {stats['messages_per_second']:,.0f} messages/sec")
+    print(f"  Accuracy:       {stats['accuracy']:.4f}")
+    print(f"  Spam precision: {stats['spam_precision']:.4f}")
+    print(f"  Spam recall:    {stats['spam_recall']:.4f}")
+    if stats['peak_rss_mb'] is not None:
+        print(f"  Peak RSS:       {stats['peak_rss_mb']:.1f} MB")
+
+if __name__ == "__main__":
+    main()
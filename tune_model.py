@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Cross-validated hyperparameter search for the Spam Email Detector project.
+Runs k-fold cross-validation over a grid of CountVectorizer and LinearSVC
+settings in parallel, prints a timing and metrics table, and saves the best
+model in the same place as train_model.
+
+Each fold is vectorized once per vectorizer setting and the resulting matrices
+are reused for every value of C, since C does not affect vectorization.
+
+Usage:
+    python tune_model.py --folds 5 --jobs -1
+    python tune_model.py --C 0.1 1 10 --ngram 1,1 1,2 --min-df 1 2 --max-features 0 5000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from itertools import product
+
+# Check if running in a virtual environment
+def check_venv():
+    """Check if running in a virtual environment."""
+    return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+
+if not check_venv():
+    print("\nERROR: Virtual environment is not activated.")
+    print("You must activate the virtual environment before running this script.")
+    print("\nTo activate the virtual environment:")
+    if os.name == 'nt':  # Windows
+        print("  venv\\Scripts\\activate")
+    else:  # macOS/Linux
+        print("  source venv/bin/activate")
+
+    print("\nExiting. Please activate the virtual environment and try again.")
+    sys.exit(1)
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.svm import LinearSVC
+from sklearn.metrics import accuracy_score, f1_score, classification_report
+from spam_detector import load_preprocessed_corpus, save_model
+from model_store import classification_metrics
+from near_duplicate import load_index
+
+def evaluate_fold(x, y, train_index, val_index, vectorizer_params, c_values):
+    """
+    Vectorize one fold with one vectorizer setting and fit a LinearSVC for each C.
+    Returns one result dict per C.
+    """
+    start = time.perf_counter()
+    cv = CountVectorizer(**vectorizer_params)
+    x_train = cv.fit_transform(x[train_index])
+    x_val = cv.transform(x[val_index])
+    vectorize_time = time.perf_counter() - start
+
+    results = []
+    for c in c_values:
+        start = time.perf_counter()
+        svm = LinearSVC(C=c)
+        svm.fit(x_train, y[train_index])
+        fit_time = time.perf_counter() - start
+        y_pred = svm.predict(x_val)
+        results.append({
+            'vectorizer': vectorizer_params,
+            'C': c,
+            'features': len(cv.vocabulary_),
+            'vectorize_seconds': vectorize_time,
+            'fit_seconds': fit_time,
+            'accuracy': accuracy_score(y[val_index], y_pred),
+            'f1': f1_score(y[val_index], y_pred),
+        })
+    return results
+
+def summarize(results):
+    """Average the per-fold results of each parameter combination, best F1 first."""
+    grouped = {}
+    for result in results:
+        key = (json.dumps(result['vectorizer'], sort_keys=True), result['C'])
+        grouped.setdefault(key, []).append(result)
+
+    rows = []
+    for (_, c), folds in grouped.items():
+        rows.append({
+            'vectorizer': folds[0]['vectorizer'],
+            'C': c,
+            'features': int(np.mean([fold['features'] for fold in folds])),
+            'vectorize_seconds': float(np.mean([fold['vectorize_seconds'] for fold in folds])),
+            'fit_seconds': float(np.mean([fold['fit_seconds'] for fold in folds])),
+            'accuracy': float(np.mean([fold['accuracy'] for fold in folds])),
+            'f1': float(np.mean([fold['f1'] for fold in folds])),
+            'f1_std': float(np.std([fold['f1'] for fold in folds])),
+        })
+    rows.sort(key=lambda row: (row['f1'], row['accuracy']), reverse=True)
+    return rows
+
+def print_table(rows):
+    print(f"\n{'ngram':>6} {'min_df':>6} {'max_feat':>8} {'C':>7} {'features':>8} "
+          f"{'vec (s)':>8} {'fit (s)':>8} {'accuracy':>9} {'f1':>14}")
+    for row in rows:
+        vectorizer = row['vectorizer']
+        ngram = '{}-{}'.format(*vectorizer['ngram_range'])
+        max_features = vectorizer['max_features'] or '-'
+        print(f"{ngram:>6} {vectorizer['min_df']:>6} {max_features:>8} {row['C']:>7g} {row['features']:>8} "
+              f"{row['vectorize_seconds']:>8.3f} {row['fit_seconds']:>8.3f} {row['accuracy']:>9.4f} "
+              f"{row['f1']:>7.4f} ± {row['f1_std']:.4f}")
+
+def tune_model(file_path, c_values, ngram_ranges, min_dfs, max_features_list, folds=5, n_jobs=-1, results_path=None):
+    """Run the grid search, save the best model and return the summary rows, or None on failure."""
+    try:
+        df, normalizer, term_frequency = load_preprocessed_corpus(file_path)
+        x = df['message'].to_numpy()
+        y = df['spam'].to_numpy()
+
+        # Keep the same held out test set as train_model, and cross-validate on the rest
+        x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.3, random_state=42)
+
+        vectorizer_grid = [
+            {'ngram_range': ngram_range, 'min_df': min_df, 'max_features': max_features or None}
+            for ngram_range, min_df, max_features in product(ngram_ranges, min_dfs, max_features_list)
+        ]
+        splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(x_train, y_train))
+        print(f"Evaluating {len(vectorizer_grid) * len(c_values)} settings with {folds}-fold cross-validation "
+              f"({len(vectorizer_grid) * folds} vectorizations)...")
+
+        start = time.perf_counter()
+        fold_results = Parallel(n_jobs=n_jobs)(
+            delayed(evaluate_fold)(x_train, y_train, train_index, val_index, params, c_values)
+            for params in vectorizer_grid
+            for train_index, val_index in splits
+        )
+        print(f"Search finished in {time.perf_counter() - start:.1f}s")
+
+        rows = summarize([result for results in fold_results for result in results])
+        print_table(rows)
+
+        # Refit the best setting on the whole training split and evaluate on the test split
+        best = rows[0]
+        print(f"\nBest setting: {best['vectorizer']}, C={best['C']:g}")
+        cv = CountVectorizer(**best['vectorizer'])
+        svm = LinearSVC(C=best['C'])
+        svm.fit(cv.fit_transform(x_train), y_train)
+        y_pred = svm.predict(cv.transform(x_test))
+        print("Classification Report:")
+        print(classification_report(y_test, y_pred))
+
+        # The near-duplicate index does not depend on the model, so the current one carries over;
+        # the cascade was calibrated against the previous model and is left out
+        save_model(cv, svm, normalizer, term_frequency, classification_metrics(y_test, y_pred),
+                   index=load_index())
+        if results_path:
+            with open(results_path, 'w') as f:
+                json.dump(rows, f, indent=2)
+            print(f"Results written to {results_path}")
+        return rows
+
+    except Exception as e:
+        print(f"Error tuning model: {e}")
+        return None
+
+def parse_ngram(value):
+    low, high = value.split(',')
+    return (int(low), int(high))
+
+def main():
+    parser = argparse.ArgumentParser(description='Cross-validated hyperparameter search for the spam model.')
+    parser.add_argument('data', nargs='?', default='mail_data.csv', help='Dataset file (default: mail_data.csv)')
+    parser.add_argument('--folds', type=int, default=5, help='Number of cross-validation folds (default: 5)')
+    parser.add_argument('--jobs', type=int, default=-1, help='Parallel worker processes, -1 for all cores (default: -1)')
+    parser.add_argument('--C', type=float, nargs='+', default=[0.01, 0.1, 1.0, 10.0], help='LinearSVC C values')
+    parser.add_argument('--ngram', type=parse_ngram, nargs='+', default=[(1, 1), (1, 2)], help='n-gram ranges as low,high')
+    parser.add_argument('--min-df', type=int, nargs='+', default=[1, 2], help='CountVectorizer min_df values')
+    parser.add_argument('--max-features', type=int, nargs='+', default=[0, 5000], help='CountVectorizer max_features values, 0 for no limit')
+    parser.add_argument('--results', help='Write the results table to this JSON file')
+    args = parser.parse_args()
+
+    rows = tune_model(args.data, args.C, args.ngram, args.min_df, args.max_features, args.folds, args.jobs, args.results)
+    if rows is None:
+        print("Failed to tune model.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()